@@ -1,18 +1,19 @@
 # -*- coding: utf-8 -*-
-from django.contrib import admin
+from django.contrib import admin, messages
 
+from posts.internal_services.services import DeleteJobService
 from posts_areas.models import PostArea
-from tektank.libs.admin import ExportCsvMixin
+from tektank.libs.export import StreamingExportCsvMixin
 
 from . import models
 
 
-class JobAdmin(admin.ModelAdmin, ExportCsvMixin):
+class JobAdmin(admin.ModelAdmin, StreamingExportCsvMixin):
     """Admin definition for posts model."""
 
-    # actions = ["export_as_csv","mark_as_deleted"]
-    actions = ["export_as_csv"]
+    actions = ["export_as_csv", "mark_as_deleted", "restore"]
     exclude = ('slug',)
+    export_exclude = ('search_vector',)
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """Filter dropdown menus, to show only related entries."""
@@ -22,10 +23,25 @@ class JobAdmin(admin.ModelAdmin, ExportCsvMixin):
             kwargs["queryset"] = PostArea.objects.exclude(parent__isnull=True)
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+    def mark_as_deleted(self, request, queryset):
+        """Soft delete the selected jobs, with set based updates."""
+        self._set_deleted(request, DeleteJobService().delete_jobs(queryset), "deleted")
+
+    mark_as_deleted.short_description = "Mark as deleted"
+
+    def restore(self, request, queryset):
+        """Restore the selected jobs, with set based updates."""
+        self._set_deleted(request, DeleteJobService().restore_jobs(queryset), "restored")
+
+    restore.short_description = "Restore deleted"
+
+    def _set_deleted(self, request, result, done):
+        error, ret = result
+        if error:
+            self.message_user(request, error, messages.ERROR)
+        else:
+            self.message_user(request, "{} jobs {}.".format(ret.get("data"), done))
 
-#    def mark_as_deleted(self, request, queryset):
-#        queryset.update(deleted=True)
-#    mark_as_deleted.short_description = "Mark as deleted"
 
 admin.site.register(models.Job, JobAdmin)
 
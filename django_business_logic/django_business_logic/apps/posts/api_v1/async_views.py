@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Async read handlers of the job endpoints, see tektank.libs.asgi.
+
+Writes, and reads these handlers pass on, are served by the viewsets in
+views.py, as usual.
+"""
+from posts.internal_services.async_adapters import AsyncJobRepository
+from tektank.libs.async_views import AsyncReadHandler
+
+from .views import ActiveJobViewSet, JobViewSet
+
+repository = AsyncJobRepository()
+jobs = AsyncReadHandler(JobViewSet, repository)
+active_jobs = AsyncReadHandler(ActiveJobViewSet, repository)
+
+# Url names served asynchronously, with their handler.
+routes = {
+    "v1:posts-job-list": jobs.list,
+    "v1:posts-job-detail": jobs.retrieve,
+    "v1:posts-activejob-list": active_jobs.list,
+    "v1:posts-activejob-detail": active_jobs.retrieve,
+}
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Pagination classes for the posts viewsets."""
+from django.conf import settings
+
+from tektank.libs.pagination import (
+    EstimatedCountLimitOffsetPagination,
+    KeysetPagination,
+    OptInKeysetPagination,
+)
+
+
+class JobKeysetPagination(KeysetPagination):
+    """Keyset pagination for jobs, newest first.
+
+    The ordering (created_at, id) is unique and served by the composite index
+    declared in `PostModel`_, so deep pages are as cheap as the first one.
+    """
+
+    ordering = ('-created_at', '-id')
+
+
+class JobLimitOffsetPagination(EstimatedCountLimitOffsetPagination):
+    """Limit/offset for jobs, with estimated counts above JOBS_COUNT_ESTIMATE_THRESHOLD."""
+
+    count_estimate_threshold = settings.JOBS_COUNT_ESTIMATE_THRESHOLD
+
+
+class JobPagination(OptInKeysetPagination):
+    """Pagination used by the job viewsets.
+
+    Limit/offset by default, where big counts are estimated (see ``count_is_exact``
+    in the response). Send ``?pagination=cursor`` to page with opaque cursors
+    instead (no COUNT, constant cost per page).
+    """
+
+    keyset_class = JobKeysetPagination
+    default_class = JobLimitOffsetPagination
@@ -6,12 +6,15 @@ from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 
 from posts.models import ActiveJob, Job
+from tektank.libs.fieldsets import SparseFieldsetMixin
+from tektank.libs.relations import PrimaryKeyIdField
 from tektank.libs.serializers import AuditedModelSerializer
 
+from ..internal_services.adapters import JobRepository
 from ..internal_services.services import CreateJobService
 
 
-class JobSerializer(serializers.ModelSerializer):
+class JobSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer of Job model.
 
     .. _JobSerializer
@@ -21,6 +24,9 @@ class JobSerializer(serializers.ModelSerializer):
     so instead of the default operations, we use our own business logic
     declared inside internal_services.
 
+    When reading, clients can narrow the output with ``?fields=a,b`` or
+    ``?omit=c,d`` (see `SparseFieldsetMixin`).
+
     Args:
         Request data for instance (json dic).
 
@@ -35,7 +41,7 @@ class JobSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Job
-        fields = '__all__'
+        exclude = ('search_vector',)
         lookup_field = 'slug'
         extra_kwargs = {'url': {'lookup_field': 'slug'}}
 
@@ -59,8 +65,39 @@ class JobSerializer(serializers.ModelSerializer):
         else:
             return ret.get('data')
 
+    def update(self, instance, validated_data):
+        """Overwrite serializer update method, so it goes through the repository.
+
+        The repository keeps derived data current (search document, caches).
+        """
+        JobRepository().update_fields(instance, validated_data)
+        return instance
+
+
+class JobCreateSerializer(JobSerializer):
+    """Serializer to create jobs, that only parses and type checks the input.
+
+    Related ids are not looked up here (see `PrimaryKeyIdField`) nor the
+    model validators run: `CreateJobService` fetches the related rows of the
+    whole request at once and `CreateJob` validates each job, a single time.
+    Fields we set (id, slug, payment_comission) are read only.
+    """
+    serializer_related_field = PrimaryKeyIdField
+
+    class Meta(JobSerializer.Meta):
+        read_only_fields = ('id', 'slug', 'payment_comission')
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = []
+        return fields
+
+    def get_validators(self):
+        return []
+
 
-class ActiveJobSerializer(serializers.ModelSerializer):
+class ActiveJobSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer of Active Job model.
 
     Same as `JobSerializer`_, but for the proxy model ActiveJob.
@@ -74,7 +111,7 @@ class ActiveJobSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ActiveJob
-        fields = '__all__'
+        exclude = ('search_vector',)
         lookup_field = 'slug'
         extra_kwargs = {'url': {'lookup_field': 'slug'}}
 
@@ -83,4 +120,4 @@ class JobSerializerAdmin(AuditedModelSerializer):
     """Serializer to use as an admin, with all fields."""
     class Meta:
         model = Job
-        fields = '__all__'
+        exclude = ('search_vector',)
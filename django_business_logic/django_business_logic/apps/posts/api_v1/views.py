@@ -5,33 +5,67 @@ Viewsets are going to be implemented in this files. All views that are going to
 be exposed and called. We are going to mantain it quite simple, as all the heavy
 lifting is going to be done by the internal services.
 """
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
 from django_filters import rest_framework as filters
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from posts.api_v1.serializers import ActiveJobSerializer, JobSerializer
+from posts.api_v1.pagination import JobPagination
+from posts.api_v1.serializers import (
+    ActiveJobSerializer,
+    JobCreateSerializer,
+    JobSerializer,
+)
+from posts.internal_services.cache import jobs_cache
+from posts.internal_services.categories import post_areas
+from posts.internal_services.services import (
+    CreateJobService,
+    DeleteJobService,
+    UpdateJobService,
+)
 from posts.models import ActiveJob, Job
-from tektank.libs.views import APIViewSet
+from posts.models.proxys import ActiveJobQuerySet
+from tektank.libs.db_pool import pool_stats
+from tektank.libs.geo import parse_point, within_radius
+from tektank.libs.views import (
+    APIViewSet,
+    CachedListMixin,
+    ConditionalRetrieveMixin,
+    FacetsMixin,
+    ReplicaReadMixin,
+    SelectRelatedMixin,
+    StreamingExportMixin,
+    ValuesListMixin,
+)
 
 
 class ActiveJobFilter(filters.FilterSet):
     """Filters for the ActiveJobViewSet.
 
     This class defines the filters that can be applied when querying the Viewset.
+    ``q`` is a full text search over title and description, ranked by relevance.
+    ``near=lat,lon&radius=km`` keeps the jobs within radius km of a point,
+    nearest first (this order wins over the one of ``q``).
 
     For a list of the urls generated, or filters that can be applied, check for
     the tests, or doc.
     """
 
+    q = filters.CharFilter(method="search")
     min_payment = filters.NumberFilter(field_name="amount_to_pay", lookup_expr="gte")
     max_payment = filters.NumberFilter(field_name="amount_to_pay", lookup_expr="lte")
     title = filters.CharFilter(lookup_expr='icontains')
-    post_category = filters.CharFilter(
-        lookup_expr='icontains', field_name='post_category__name',
-    )
+    post_category = filters.CharFilter(field_name='post_category', method='filter_area')
     post_subcategory = filters.CharFilter(
-        lookup_expr='icontains', field_name='post_subcategory__name',
+        field_name='post_subcategory', method='filter_area',
     )
+    near = filters.CharFilter(method="filter_near")
+    radius = filters.NumberFilter(method="filter_radius")
 
     class Meta:  # noqa: D106
         model = ActiveJob
@@ -44,27 +78,107 @@ class ActiveJobFilter(filters.FilterSet):
             "post_subcategory",
             "min_payment",
             "max_payment",
+            "q",
+            "near",
+            "radius",
         ]
 
+    def filter_area(self, queryset, name, value):
+        """Filter by category name (contains, ignoring case).
+
+        Names are resolved to ids from an in-memory map of PostArea, so the
+        query is an indexed ``IN`` on the FK column, not a join with LIKE.
+        """
+        ids = post_areas.ids_containing(value)
+        return queryset.filter(**{"{}__in".format(name): ids})
+
+    def filter_near(self, queryset, name, value):
+        """Jobs within ``radius`` km of the point "lat,lon", nearest first.
+
+        Reads the coordinates copied to the job, a bounding box over their
+        index is filtered before computing exact distances. Jobs without
+        coordinates are left out.
+        """
+        try:
+            lat, lon = parse_point(value)
+        except ValueError:
+            raise ValidationError({name: ['Expected "latitude,longitude".']})
+        radius = self.form.cleaned_data.get("radius")
+        radius = settings.JOBS_NEAR_DEFAULT_RADIUS if radius is None else float(radius)
+        if not 0 < radius <= settings.JOBS_NEAR_MAX_RADIUS:
+            raise ValidationError({"radius": [
+                "Expected more than 0 and at most {} km.".format(settings.JOBS_NEAR_MAX_RADIUS),
+            ]})
+        return within_radius(queryset, lat, lon, radius).order_by("distance")
+
+    def filter_radius(self, queryset, name, value):
+        """Nothing to do, `filter_near` reads the radius."""
+        return queryset
 
-class JobViewSet(APIViewSet):
+    def search(self, queryset, name, value):
+        """Full text search on title and description, best matches first.
+
+        Uses the indexed `search_vector`, instead of scanning with icontains.
+        The order is kept by limit/offset pagination, cursor pagination uses its
+        own ordering.
+        """
+        query = SearchQuery(value, config=settings.JOBS_SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).order_by(
+            SearchRank(F("search_vector"), query).desc(),
+        )
+
+
+class JobViewSet(
+    ReplicaReadMixin, ConditionalRetrieveMixin, SelectRelatedMixin, APIViewSet,
+):
     """Viewset for Job model.
 
     This viewset will be called when creating or updating new jobs.
 
     Create function is overwritten so we can perform the operation through the
     serializer, and call our own business logic declared in the internal services.
+    On creation the serializer (`JobCreateSerializer`) only parses the input:
+    related rows are fetched once by the service, and `CreateJob` validates.
 
     The lookup field for a particular job is the slug generated, and not
     the id straightforward.
 
+    Lists are paginated with limit/offset, or with cursors if the client sends
+    ``?pagination=cursor`` (see `JobPagination`). Related rows rendered by the
+    serializer (categories) are joined in the same query. ``?fields=`` and
+    ``?omit=`` narrow both the output and the columns read from the database.
+
+    Retrieve sends ETag and Last-Modified headers, and answers conditional
+    requests with a 304 without loading the job.
+
+    ``POST jobs/batch/`` with a list of jobs creates all of them at once (see
+    `batch`), ``PATCH jobs/bulk/`` updates many (see `bulk_update`) and
+    ``POST jobs/bulk-delete/`` or ``jobs/bulk-restore/`` soft delete or restore
+    many (see `bulk_delete`). ``jobs/db-stats/`` has the statistics of the
+    database connection pools, for admins.
+
+    Reads of safe requests go to a replica, if any is healthy, and writes to
+    the primary. A client that just wrote reads from the primary for a few
+    seconds (see `ReplicaReadMixin`).
+
     Implements:
-        create, update, retrieve, delete, list
+        create, update, retrieve, delete, list, batch, bulk_update, bulk_delete,
+        bulk_restore, db_stats
     """
 
     queryset = Job.objects.all()
     serializer_class = JobSerializer
     lookup_field = "slug"
+    pagination_class = JobPagination
+    # Keyset pagination reads it, keep it when the client narrows the fields.
+    required_columns = ("created_at",)
+    max_batch_size = settings.JOBS_MAX_BATCH_SIZE
+
+    def get_serializer_class(self):
+        """Creating jobs only parses the input, CreateJob validates it."""
+        if self.action in ("create", "batch"):
+            return JobCreateSerializer
+        return super().get_serializer_class()
 
     def create(self, request, *args, **kwargs):
         """Create a new Job. Called when posting a new Job.
@@ -91,8 +205,150 @@ class JobViewSet(APIViewSet):
         """Call the serializer save method and maybe do something else."""
         serializer.save()
 
+    @action(detail=False, methods=["post"])
+    def batch(self, request, *args, **kwargs):
+        """Create many Jobs in one request, all or none.
+
+        The body is a list of jobs, like the ones sent to create. Lookups are
+        shared and the jobs inserted together (see `CreateJobService.create_jobs`).
+
+        Returns:
+            201 with the jobs created, in the same order. Or 400 with a list
+            that has the errors of each job (empty for the valid ones).
+
+        """
+        error = self.check_batch(request.data)
+        if error is not None:
+            return error
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        errors, ret = CreateJobService().create_jobs(serializer.validated_data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(ret.get("data"), many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["patch"], url_path="bulk")
+    def bulk_update(self, request, *args, **kwargs):
+        """Partially update many Jobs in one request, all or none.
+
+        The body is a list of partial jobs, each one with the ``slug`` of the
+        job to update. Every job is validated again with its new values and
+        all are written with set based updates (see `UpdateJobService`).
+
+        Returns:
+            200 with the jobs updated, in the same order. Or 400 with a list
+            that has the errors of each job (empty for the valid ones).
 
-class ActiveJobViewSet(APIViewSet):
+        """
+        error = self.check_batch(request.data)
+        if error is not None:
+            return error
+        slugs = [item.get(self.lookup_field) for item in request.data]
+        lookup = "{}__in".format(self.lookup_field)
+        jobs = {
+            getattr(job, self.lookup_field): job
+            for job in self.get_queryset().filter(**{lookup: [s for s in slugs if s]})
+        }
+        changes, errors = [], []
+        for slug, item in zip(slugs, request.data):
+            instance = jobs.get(slug)
+            if instance is None:
+                errors.append({self.lookup_field: ["Not found."]})
+                continue
+            data = {k: v for k, v in item.items() if k != self.lookup_field}
+            serializer = self.get_serializer(instance, data=data, partial=True)
+            if serializer.is_valid():
+                changes.append((instance, serializer.validated_data))
+                errors.append({})
+            else:
+                errors.append(serializer.errors)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        errors, ret = UpdateJobService().update_jobs(changes)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(ret.get("data"), many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["post"], url_path="bulk-delete")
+    def bulk_delete(self, request, *args, **kwargs):
+        """Soft delete the jobs with the slugs in ``{"slugs": [...]}``.
+
+        Jobs are flagged as deleted with set based updates, not one by one
+        (see `DeleteJobService`).
+
+        Returns:
+            200 with ``{"count": <jobs deleted>}``.
+
+        """
+        return self._set_deleted(request, DeleteJobService().delete_jobs)
+
+    @action(detail=False, methods=["post"], url_path="bulk-restore")
+    def bulk_restore(self, request, *args, **kwargs):
+        """Restore the soft deleted jobs with the slugs in ``{"slugs": [...]}``.
+
+        Returns:
+            200 with ``{"count": <jobs restored>}``.
+
+        """
+        return self._set_deleted(request, DeleteJobService().restore_jobs)
+
+    @action(detail=False, url_path="db-stats", permission_classes=[IsAdminUser])
+    def db_stats(self, request):
+        """Return the database connection pools of the process that answers.
+
+        Checkouts, waits and saturation, to size the pools against the workers.
+        """
+        return Response(pool_stats())
+
+    def _set_deleted(self, request, operation):
+        slugs = request.data.get("slugs") if isinstance(request.data, dict) else None
+        if not isinstance(slugs, list) or not slugs or not all(
+                isinstance(slug, str) for slug in slugs):
+            return Response(
+                {"slugs": ["Expected a non empty list of slugs."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lookup = "{}__in".format(self.lookup_field)
+        error, ret = operation(Job.objects.filter(**{lookup: slugs}))
+        if error:
+            return Response({"non_field_errors": [error]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"count": ret.get("data")})
+
+    def check_batch(self, data):
+        """Return a 400 Response if data is not a list of jobs we can take."""
+        if not isinstance(data, list) or not data or not all(
+                isinstance(item, dict) for item in data):
+            return Response(
+                {"non_field_errors": ["Expected a non empty list of jobs."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(data) > self.max_batch_size:
+            return Response(
+                {"non_field_errors": [
+                    "At most {} jobs per batch.".format(self.max_batch_size),
+                ]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return None
+
+    def perform_destroy(self, instance):
+        """Delete the instance, and invalidate cached listings."""
+        instance.delete()
+        jobs_cache.bump_on_commit()
+
+
+class ActiveJobViewSet(
+    ReplicaReadMixin,
+    CachedListMixin,
+    FacetsMixin,
+    ConditionalRetrieveMixin,
+    StreamingExportMixin,
+    ValuesListMixin,
+    SelectRelatedMixin,
+    APIViewSet,
+):
     """Viewset for ActiveJob model. So Jobs that are elegibles to apply (active).
 
     This viewset will be called when listing or retrieving jobs.
@@ -100,12 +356,50 @@ class ActiveJobViewSet(APIViewSet):
     The lookup field for a particular job is the slug generated, and not
     the id straightforward.
 
+    Lists are read with ``values()`` and converted straight to the output of
+    `ActiveJobSerializer`, without building an ActiveJob per row. They are
+    cached by filters and pagination until a job is written (see
+    internal_services.cache), hit/miss counters are in ``cache-stats``.
+
+    Retrieve supports conditional requests, as in `JobViewSet`.
+
+    ``export/`` streams every active job matching the filters, as NDJSON or
+    CSV (``?export_format=csv``), for partners pulling the whole catalogue.
+
+    ``facets/`` counts the active jobs matching the filters by category,
+    subcategory, city and payment (``great_payed``/``no_great_payed``). Each
+    value is what the filter of the same name takes. All counts come from one
+    grouped query, cached as listings.
+
+    Reads go to a healthy replica when there is one, as in `JobViewSet`.
+
     Implements:
-        Retrieve, List
+        Retrieve, List, Export, Facets
     """
 
     queryset = ActiveJob.objects.all()
     serializer_class = ActiveJobSerializer
     lookup_field = "slug"
+    pagination_class = JobPagination
+    # Keyset pagination reads it, keep it when the client narrows the fields.
+    required_columns = ("created_at",)
+    # Same text as PostArea.__str__, read from the join instead of an instance.
+    values_string_related = {
+        "post_category": "post_category__name",
+        "post_subcategory": "post_subcategory__name",
+    }
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = ActiveJobFilter
+    list_cache = jobs_cache
+    facets_cache = jobs_cache
+    facet_fields = {
+        "post_category": "post_category__name",
+        "post_subcategory": "post_subcategory__name",
+        "city": "city",
+        "payment": ActiveJobQuerySet.payment_bucket(),
+    }
+
+    @action(detail=False, url_path="cache-stats", permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """Return hits and misses of the listings cache, to tune its timeout."""
+        return Response(self.list_cache.stats())
@@ -8,6 +8,5 @@ class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = _('posts')
 
-
-#    def ready(self):
-#        import posts.signals  # noqa: F401
+    def ready(self):
+        import posts.signals  # noqa: F401
@@ -5,11 +5,31 @@ This implementations will do operations on the database, it will call
 the ORM. So it can be easily changed if we need to operate on a different
 type of database.
 """
+from typing import List, Tuple
+
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
 
 from posts.models import Job
+from tektank.libs.bulk import bulk_update
 
+from .cache import jobs_cache
 from .interfaces import JobRepositoryInterface
+from .locations import COORDINATE_FIELDS, LOCATION_FIELDS, locate
+
+# Fields the search document is built from, see PostModel.search_document.
+SEARCH_FIELDS = frozenset(('title', 'description'))
+
+# Fields save() sets on every write (updated_at), so update_fields keeps them too.
+AUTO_NOW_FIELDS = [
+    field.name for field in Job._meta.concrete_fields if getattr(field, 'auto_now', False)
+]
+
+# Rows per INSERT statement when saving many jobs.
+BULK_BATCH_SIZE = 500
+# Rows per UPDATE when soft deleting or restoring, to keep locks short.
+SOFT_DELETE_CHUNK_SIZE = 1000
 
 
 class JobRepository(JobRepositoryInterface):
@@ -85,7 +105,36 @@ class JobRepository(JobRepositoryInterface):
             Job: The Job instance after being saved.
 
         """
-        return instance.save()
+        locate([instance])
+        ret = instance.save()
+        self.refresh_search_vector(instance)
+        jobs_cache.bump_on_commit()
+        return ret
+
+    def bulk_create(self, instances: List[Job]) -> List[Job]:
+        """Save many new Job instances at once, in a single transaction.
+
+        ``bulk_create(self, instances: List[Job]) -> List[Job]``
+
+        Inserts are batched (``BULK_BATCH_SIZE`` rows per statement), and the
+        search documents of all of them are computed with one UPDATE. As with
+        ``QuerySet.bulk_create``, ``save()`` is not called on the instances.
+
+        Args:
+            instances (list): Jobs not saved yet, with their ids set.
+
+        Returns:
+            list: The Jobs saved.
+
+        """
+        locate(instances)
+        with transaction.atomic():
+            jobs = Job.objects.bulk_create(instances, batch_size=BULK_BATCH_SIZE)
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                search_vector=Job.search_document(),
+            )
+        jobs_cache.bump_on_commit()
+        return jobs
 
     def update_fields(self, instance: Job, fields: dict) -> Job:
         """Update some fields on a Job instance.
@@ -111,7 +160,106 @@ class JobRepository(JobRepositoryInterface):
         """
         for attr, val in fields.items():
             setattr(instance, attr, val)
-        return instance.save(update_fields=fields.keys())
+        update_fields = list(fields) + [
+            name for name in AUTO_NOW_FIELDS if name not in fields
+        ]
+        if set(LOCATION_FIELDS).intersection(fields):
+            locate([instance])
+            update_fields += COORDINATE_FIELDS
+        ret = instance.save(update_fields=update_fields)
+        if SEARCH_FIELDS.intersection(fields):
+            self.refresh_search_vector(instance)
+        jobs_cache.bump_on_commit()
+        return ret
+
+    def bulk_update_fields(self, changes: List[Tuple[Job, dict]]) -> List[Job]:
+        """Update some fields on many Job instances, with set based writes.
+
+        ``bulk_update_fields(self, changes: List[Tuple[Job, dict]]) -> List[Job]``
+
+        Instances that change the same fields are written together, with one
+        UPDATE per ``BULK_BATCH_SIZE`` rows (see `bulk_update`), all in one
+        transaction. Search documents are recomputed with one more UPDATE,
+        only for the jobs whose title or description changed. Coordinates, for
+        the ones whose postal code or city changed.
+
+        Args:
+            changes (list): (instance, {field: new_value}) tuples.
+
+        Returns:
+            list: The Jobs updated.
+
+        """
+        groups = {}
+        search_pks = []
+        moved = []
+        for instance, fields in changes:
+            for attr, val in fields.items():
+                setattr(instance, attr, val)
+            names = set(fields)
+            if names.intersection(LOCATION_FIELDS):
+                moved.append(instance)
+                names.update(COORDINATE_FIELDS)
+            groups.setdefault(tuple(sorted(names)), []).append(instance)
+            if SEARCH_FIELDS.intersection(fields):
+                search_pks.append(instance.pk)
+        if moved:
+            locate(moved)
+        with transaction.atomic():
+            for fields, instances in groups.items():
+                bulk_update(instances, fields, batch_size=BULK_BATCH_SIZE)
+            if search_pks:
+                Job.objects.filter(pk__in=search_pks).update(
+                    search_vector=Job.search_document(),
+                )
+        jobs_cache.bump_on_commit()
+        return [instance for instance, _ in changes]
+
+    def set_deleted(self, queryset: 'QuerySet', deleted: bool) -> int:  # noqa: F821
+        """Soft delete (or restore) every Job in a queryset.
+
+        ``set_deleted(self, queryset: QuerySet, deleted: bool) -> int``
+
+        Runs one UPDATE per ``SOFT_DELETE_CHUNK_SIZE`` jobs, each one in its
+        own short transaction, instead of saving them one by one. Deleted jobs
+        leave the search index (their search document is cleared) and get it
+        back when restored. Cached listings are invalidated once at the end.
+
+        Args:
+            queryset (QuerySet): Jobs to delete or restore.
+            deleted (bool): True to delete, False to restore.
+
+        Returns:
+            int: Number of jobs changed.
+
+        """
+        pending = queryset.filter(deleted=not deleted).order_by().values_list('pk', flat=True)
+        search_vector = None if deleted else Job.search_document()
+        changed = 0
+        while True:
+            pks = list(pending[:SOFT_DELETE_CHUNK_SIZE])
+            if not pks:
+                break
+            changed += Job.objects.filter(pk__in=pks).update(
+                deleted=deleted, search_vector=search_vector, updated_at=timezone.now(),
+            )
+        if changed:
+            jobs_cache.bump_on_commit()
+        return changed
+
+    def refresh_search_vector(self, instance: Job) -> None:
+        """Recompute the full text search document of a Job in the database.
+
+        ``refresh_search_vector(self, instance: Job) -> None``
+
+        It is computed by Postgres from the stored title and description, so
+        it must be called after saving them.
+
+        Args:
+            instance (Job): Instance already saved.
+
+        """
+        Job.objects.filter(pk=instance.pk).update(search_vector=Job.search_document())
 
     def _factory(self, **kwargs) -> Job:
         """Return an instance of a Job class with parameters provided."""
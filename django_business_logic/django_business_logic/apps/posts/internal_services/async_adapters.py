@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Non-blocking implementation of the repository, for the async handlers.
+
+Every operation is a coroutine. The ORM is synchronous, so the work is done by
+`JobRepository` in the thread pool of tektank.libs.asgi, and the event loop
+only waits for it.
+"""
+from typing import List, Tuple
+
+from posts.models import Job
+from tektank.libs.asgi import run_in_thread
+
+from .adapters import JobRepository
+from .interfaces import JobRepositoryInterface
+
+
+class AsyncJobRepository(JobRepositoryInterface):
+    """Async version of `JobRepository`: same operations, awaited.
+
+    Besides the operations of the interface, it reads querysets built by the
+    views: `get`, `fetch` and `paginate`.
+    """
+
+    def __init__(self, repository: JobRepositoryInterface = None):
+        self.repository = repository or JobRepository()
+
+    async def find(self, uuid: 'UUID') -> Job:  # noqa: T484, F821
+        return await run_in_thread(self.repository.find, uuid)
+
+    async def create(self, **kwargs) -> Job:
+        return await run_in_thread(self.repository.create, **kwargs)
+
+    async def get_or_create(self, **kwargs) -> Job:
+        return await run_in_thread(self.repository.get_or_create, **kwargs)
+
+    async def factory(self, **kwargs) -> Job:
+        return self.repository.factory(**kwargs)
+
+    async def save(self, instance: Job) -> Job:
+        return await run_in_thread(self.repository.save, instance)
+
+    async def bulk_create(self, instances: List[Job]) -> List[Job]:
+        return await run_in_thread(self.repository.bulk_create, instances)
+
+    async def bulk_update_fields(self, changes: List[Tuple[Job, dict]]) -> List[Job]:
+        return await run_in_thread(self.repository.bulk_update_fields, changes)
+
+    async def set_deleted(self, queryset: 'QuerySet', deleted: bool) -> int:  # noqa: F821
+        return await run_in_thread(self.repository.set_deleted, queryset, deleted)
+
+    async def update_fields(self, instance: Job, fields: dict) -> Job:
+        return await run_in_thread(self.repository.update_fields, instance, fields)
+
+    async def get(self, queryset: 'QuerySet', **params):  # noqa: F821
+        """Return the first row of queryset matching params, or None."""
+        return await run_in_thread(lambda: queryset.filter(**params).first())
+
+    async def fetch(self, queryset: 'QuerySet') -> list:  # noqa: F821
+        """Return all the rows of queryset."""
+        return await run_in_thread(list, queryset)
+
+    async def paginate(self, paginator, queryset: 'QuerySet', request, view=None):  # noqa: F821
+        """Return the page of queryset that request asks for, or None.
+
+        The paginator keeps its state, to build the paginated response.
+        """
+        def read_page():
+            page = paginator.paginate_queryset(queryset, request, view=view)
+            return list(page) if page is not None else None
+        return await run_in_thread(read_page)
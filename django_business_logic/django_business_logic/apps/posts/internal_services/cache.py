@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Caches of the posts app.
+
+Every write on jobs must call ``jobs_cache.bump_on_commit()``, so cached
+listings are not served anymore. The repository already does it.
+"""
+from django.conf import settings
+
+from tektank.libs.cache import GenerationCache
+
+# Active jobs expire with time too, so keep the timeout short.
+jobs_cache = GenerationCache(
+    'posts.jobs', timeout=getattr(settings, 'JOBS_LIST_CACHE_TIMEOUT', 60),
+)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""In-process lookups over PostArea (categories of posts).
+
+PostArea is a small table that rarely changes, so instead of joining it on
+every query we keep a copy of it in memory for a while.
+"""
+from django.conf import settings
+
+from posts_areas.models import PostArea
+from tektank.libs.cache import ExpiringTable
+
+
+class PostAreaRegistry(ExpiringTable):
+    """Copy of the PostArea tree, reloaded every ``timeout`` seconds.
+
+    ``class PostAreaRegistry(timeout=300)``
+
+    Areas are resolved by name or id without queries, and their ``parent``
+    is already linked to the parent area of the registry. Saving or deleting
+    a PostArea invalidates the copy of this process (see posts.signals), the
+    other processes reload it when it times out.
+
+    The areas are shared, treat them as read only.
+
+    Usage::
+
+        ids = post_areas.ids_containing('design')
+        Job.objects.filter(post_category__in=ids)
+
+        area = post_areas.by_name('Web Design')
+        area.parent.name
+    """
+
+    def load(self):
+        """Read the areas, and return (by id, by name, by lowercased name)."""
+        by_id = {area.pk: area for area in PostArea.objects.order_by('pk')}
+        by_name, names = {}, {}
+        for area in by_id.values():
+            if area.parent_id in by_id:
+                area.parent = by_id[area.parent_id]
+            # Names can repeat under different parents, the first by id wins.
+            by_name.setdefault(area.name, area)
+            names.setdefault(area.name.lower(), []).append(area.pk)
+        return by_id, by_name, names
+
+    def get(self, pk):
+        """Return the PostArea with this id, or None."""
+        return self._data()[0].get(pk)
+
+    def by_name(self, name):
+        """Return the PostArea with exactly this name, or None."""
+        return self._data()[1].get(name)
+
+    def names(self):
+        """Return a dict {lowercased name: [ids]}."""
+        return self._data()[2]
+
+    def ids_containing(self, text):
+        """Ids of the areas whose name contains text, ignoring case (like icontains)."""
+        text = text.lower()
+        return [pk for name, pks in self.names().items() if text in name for pk in pks]
+
+
+post_areas = PostAreaRegistry(
+    timeout=getattr(settings, 'POST_AREAS_CACHE_TIMEOUT', 300),
+)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""In-process table of the PaymentComission brackets.
+
+Each PaymentComission applies from an amount to pay up to the next one, so
+the comission of a job is found with a binary search over the sorted
+brackets, in memory, instead of querying the table on every job created.
+"""
+import logging
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+
+from payments_comissions.models import PaymentComission
+from tektank.libs.cache import ExpiringTable
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentComissionBrackets(ExpiringTable):
+    """Sorted PaymentComission brackets, reloaded every ``timeout`` seconds.
+
+    ``class PaymentComissionBrackets(bound_field='min_amount', timeout=300)``
+
+    ``bound_field`` is the field of PaymentComission with the lowest amount
+    to pay each one applies to. Amounts below every bracket, or a model
+    without that field, are left to ``PaymentComission.assign_payment_comission``.
+    The table is checked against that method at each bound when it is read,
+    and if they disagree every amount is left to it.
+
+    Saving or deleting a PaymentComission invalidates the table of this
+    process (see posts.signals), the other processes reload it when it times
+    out. The comissions are shared, treat them as read only.
+
+    Usage::
+
+        payment_comissions.assign(amount_to_pay)
+        payment_comissions.assign_many([20, 60, 20])
+    """
+
+    def __init__(self, bound_field='min_amount', timeout=300):
+        super().__init__(timeout=timeout)
+        self.bound_field = bound_field
+
+    def load(self):
+        """Read the brackets, and return (bounds, comissions) sorted by bound."""
+        try:
+            PaymentComission._meta.get_field(self.bound_field)
+        except FieldDoesNotExist:
+            logger.warning(
+                'PaymentComission has no %s field, comissions are not precomputed',
+                self.bound_field,
+            )
+            rows = []
+        else:
+            rows = list(PaymentComission.objects.exclude(
+                **{self.bound_field: None}
+            ).order_by(self.bound_field))
+        bounds = [getattr(row, self.bound_field) for row in rows]
+        if not self._matches_model(bounds, rows):
+            logger.warning(
+                'PaymentComission brackets by %s do not match assign_payment_comission, '
+                'comissions are not precomputed', self.bound_field,
+            )
+            bounds, rows = [], []
+        return bounds, rows
+
+    @staticmethod
+    def _matches_model(bounds, comissions):
+        """True if the model assigns each bracket from its bound, and the previous one below."""
+        for index, (bound, comission) in enumerate(zip(bounds, comissions)):
+            expected = [(bound, comission)]
+            if index > 0:
+                expected.append((bound - 1, comissions[index - 1]))
+            for amount, bracket in expected:
+                assigned = PaymentComission.assign_payment_comission(amount)
+                if getattr(assigned, 'pk', None) != bracket.pk:
+                    return False
+        return True
+
+    def assign(self, amount_to_pay):
+        """Return the PaymentComission that applies to amount_to_pay."""
+        return self.assign_many([amount_to_pay])[0]
+
+    def assign_many(self, amounts):
+        """Return the PaymentComission of each amount, in the same order.
+
+        The table is read once for all of them, and each distinct amount is
+        searched once. None amounts get None.
+        """
+        bounds, comissions = self._data()
+        found = {}
+        for amount in set(amounts):
+            if amount is None:
+                found[amount] = None
+                continue
+            index = bisect_right(bounds, amount) - 1
+            found[amount] = (
+                comissions[index] if index >= 0
+                else PaymentComission.assign_payment_comission(amount)
+            )
+        return [found[amount] for amount in amounts]
+
+
+payment_comissions = PaymentComissionBrackets(
+    bound_field=getattr(settings, 'PAYMENT_COMISSION_BOUND_FIELD', 'min_amount'),
+    timeout=getattr(settings, 'PAYMENT_COMISSIONS_CACHE_TIMEOUT', 300),
+)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Commands: the input of the use cases, as small typed objects.
+
+Batch imports build one command per job, so they have ``__slots__`` (no
+``__dict__`` per instance) and the fields are mapped to the model kwargs
+with a precomputed getter, instead of looking them up one by one.
+"""
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Optional
+
+from posts.models.models import STRIPPED_FIELDS
+
+# Fields of a Job a client sets, with the same names as in the model.
+JOB_FIELDS = (
+    'title',
+    'email',
+    'date_start',
+    'date_end',
+    'amount_to_pay',
+    'avatar',
+    'company',
+    'city',
+    'state',
+    'country',
+    'postal_code',
+    'post_category',
+    'post_subcategory',
+    'address',
+    'phone',
+    'cellphone',
+    'description',
+    'terms',
+    'deleted',
+)
+
+
+class JobCommand:
+    """Fields to create a Job with, the input of `CreateJob`.
+
+    Categories can be given by name, `CreateJob` resolves them. Slug and
+    payment comission are not here: they are always set by us.
+    """
+
+    __slots__ = JOB_FIELDS
+
+    # Returns the values of JOB_FIELDS, in order, in a single call.
+    _values = attrgetter(*JOB_FIELDS)
+
+    def __init__(
+        self,
+        title: str,
+        email: str,
+        date_start: datetime,
+        date_end: datetime,
+        amount_to_pay: int,
+        avatar: Any = None,
+        company: Any = None,
+        city: Any = None,
+        state: Any = None,
+        country: Any = None,
+        postal_code: Any = None,
+        post_category: Any = None,
+        post_subcategory: Any = None,
+        address: Optional[str] = None,
+        phone: Optional[str] = None,
+        cellphone: Optional[str] = None,
+        description: Optional[str] = None,
+        terms: Optional[str] = None,
+        deleted: bool = False,
+    ):
+        self.title = title
+        self.email = email
+        self.date_start = date_start
+        self.date_end = date_end
+        self.amount_to_pay = amount_to_pay
+        self.avatar = avatar
+        self.company = company
+        self.city = city
+        self.state = state
+        self.country = country
+        self.postal_code = postal_code
+        self.post_category = post_category
+        self.post_subcategory = post_subcategory
+        self.address = address
+        self.phone = phone
+        self.cellphone = cellphone
+        self.description = description
+        self.terms = terms
+        self.deleted = deleted
+
+    def strip(self):
+        """Delete the whitespace around the text fields."""
+        for name in STRIPPED_FIELDS:
+            value = getattr(self, name)
+            if isinstance(value, str):
+                setattr(self, name, value.strip())
+
+    def job_kwargs(self) -> dict:
+        """Return the kwargs of the Job, leaving out the None values."""
+        return {
+            name: value
+            for name, value in zip(JOB_FIELDS, self._values(self))
+            if value is not None
+        }
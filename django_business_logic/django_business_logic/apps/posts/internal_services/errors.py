@@ -39,3 +39,18 @@ class InvalidCategories(Error):
         return 'Choosen categories does not belong together: {}, {}'.format(
             self.parent, self.son,
         )
+
+
+class InvalidBatch(Error):
+    """When some of the jobs of a batch are not valid.
+
+    ``errors`` has one message per job of the batch, empty for the valid ones.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+
+    def __str__(self):
+        return ', '.join(
+            '{}: {}'.format(i, error) for i, error in enumerate(self.errors) if error
+        )
@@ -5,6 +5,7 @@ Basically this file will contain only interfaes, implemented by the adapters.
 All operations must be implemented.
 """
 import abc
+from typing import List, Tuple
 
 from posts.models import Job
 
@@ -93,6 +94,52 @@ class JobRepositoryInterface(metaclass=abc.ABCMeta):
         """
         pass
 
+    @abc.abstractmethod
+    def bulk_create(self, instances: List[Job]) -> List[Job]:
+        """Save many new Job instances at once, in a single transaction.
+
+        ``bulk_create(self, instances: List[Job]) -> List[Job]``
+
+        Args:
+            instances (list): Jobs not saved yet.
+
+        Returns:
+            list: The Jobs saved.
+
+        """
+        pass
+
+    @abc.abstractmethod
+    def bulk_update_fields(self, changes: List[Tuple[Job, dict]]) -> List[Job]:
+        """Update some fields on many Job instances, with set based writes.
+
+        ``bulk_update_fields(self, changes: List[Tuple[Job, dict]]) -> List[Job]``
+
+        Args:
+            changes (list): (instance, {field: new_value}) tuples.
+
+        Returns:
+            list: The Jobs updated.
+
+        """
+        pass
+
+    @abc.abstractmethod
+    def set_deleted(self, queryset: 'QuerySet', deleted: bool) -> int:  # noqa: F821
+        """Soft delete (or restore) every Job in a queryset.
+
+        ``set_deleted(self, queryset: QuerySet, deleted: bool) -> int``
+
+        Args:
+            queryset (QuerySet): Jobs to delete or restore.
+            deleted (bool): True to delete, False to restore.
+
+        Returns:
+            int: Number of jobs changed.
+
+        """
+        pass
+
     @abc.abstractmethod
     def update_fields(self, instance: Job, fields: dict) -> Job:
         """Update some fields on a Job instance.
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Coordinates of jobs, copied from the places they are linked to.
+
+Distance searches read ``latitude``/``longitude`` of the job itself (see
+tektank.libs.geo), so they must be set whenever the postal code or the city
+of a job change. The repository does it on every write.
+"""
+from typing import List
+
+from posts.models import Job
+
+# In order of precision: the first one with a location wins.
+LOCATION_FIELDS = ('postal_code', 'city')
+COORDINATE_FIELDS = ('latitude', 'longitude')
+
+
+def locate(jobs: List[Job]) -> None:
+    """Set latitude/longitude of jobs from their postal code, or else their city.
+
+    Places already set on a job (``job.city = city``) are used as they are;
+    the rest are loaded with one query per related model for all the jobs.
+    """
+    places = {}
+    for name in LOCATION_FIELDS:
+        places[name] = _places(Job._meta.get_field(name), jobs)
+    for job in jobs:
+        job.latitude = job.longitude = None
+        for name in LOCATION_FIELDS:
+            place = places[name].get(getattr(job, Job._meta.get_field(name).attname))
+            point = getattr(place, 'location', None)
+            if point is not None:
+                job.latitude, job.longitude = point.y, point.x
+                break
+
+
+def _places(field, jobs: List[Job]) -> dict:
+    """Return the places of field linked to jobs, by id.
+
+    Only the ids that are not cached on their job are queried. A cached place
+    is used only if it is still the one of the id (setting the id directly
+    does not clear the cache).
+    """
+    places, missing = {}, set()
+    for job in jobs:
+        value = getattr(job, field.attname)
+        if value is None:
+            continue
+        cached = field.get_cached_value(job, None)
+        if cached is not None and getattr(cached, field.target_field.attname) == value:
+            places[value] = cached
+        else:
+            missing.add(value)
+    missing.difference_update(places)
+    if missing:
+        places.update(field.related_model._default_manager.in_bulk(missing))
+    return places
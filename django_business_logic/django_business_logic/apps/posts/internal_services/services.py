@@ -12,17 +12,37 @@ called from the rest of the code or from outside.
 EVERY OPERATION on the model should go through this services. As here is
 where all the validations are made.
 """
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from posts.models import Job
+from tektank.libs.validation import resolve_foreign_keys
 
 from .adapters import JobRepository
 from .errors import Error as JobError
-from .usecases import CreateJob
+from .errors import InvalidBatch
+from .usecases import CreateJob, CreateJobs, SetJobsDeleted, UpdateJobs
+
+# Given by name or id, CreateJob resolves them from the in-memory PostAreas.
+CATEGORY_FIELDS = ('post_category', 'post_subcategory')
 
 # Instead of Any, should be Job. But if we return more things, I left Any
 RetDict = Dict[str, Any]
 RetValue = Tuple[str, RetDict]
+# One error string per item, empty for the valid ones. No errors at all is [].
+BatchRetValue = Tuple[List[str], RetDict]
+
+
+def check_constraints():
+    """Check the deferred constraints (foreign keys) now, raising IntegrityError.
+
+    Postgres checks foreign keys at commit, which is not the end of our
+    atomic block when there is an outer transaction (ATOMIC_REQUESTS, or the
+    caller's), so errors would escape from there instead of being returned.
+    """
+    transaction.get_connection().check_constraints()
 
 
 class CreateJobService:
@@ -38,7 +58,8 @@ class CreateJobService:
         """Concrete execution of the service, create a Job.
 
         Args:
-            kwargs should contain all (at least required) parameters in Job model
+            kwargs should contain all (at least required) parameters in Job model.
+                Related rows can be given by id, they are fetched here.
 
         Returns:
             A tuple containing a string with any errors and a dic with the job created.
@@ -51,11 +72,122 @@ class CreateJobService:
         errors = []
         ret_data = {}
         repository = JobRepository()
+        missing = resolve_foreign_keys(Job, [kwargs], exclude=CATEGORY_FIELDS)[0]
+        if missing:
+            return str(ValidationError(missing)), ret_data
         try:
             usecase = CreateJob(repository, **kwargs)
-            new_job = usecase.execute()
-        except (JobError, ValidationError) as err:
+            # Related rows are left to the database constraints (they can be
+            # deleted meanwhile), so a failed insert is an error too.
+            with transaction.atomic():
+                new_job = usecase.execute()
+                check_constraints()
+        except (JobError, ValidationError, IntegrityError) as err:
             errors.append(str(err))
         else:
             ret_data.update({'data': new_job})
         return ','.join(errors), ret_data
+
+    def create_jobs(self, jobs: List[dict]) -> BatchRetValue:
+        """Create many jobs at once, all or none.
+
+        Each job is validated as in `create_job`. Related rows (given by id,
+        categories, payment comissions) are looked up once for the whole batch,
+        and the jobs are inserted together in one transaction.
+
+        Args:
+            jobs: list of dicts, each one like the kwargs of `create_job`.
+
+        Returns:
+            A tuple with the errors and a dict with the list of jobs created.
+            Errors is [] when all jobs were created, otherwise it has one
+            string per job (empty for the valid ones) and nothing is created.
+
+        Raises:
+            Errors are captured and listed into the return tuple, on the first component.
+            So this does not raises exceptions (or should not).
+
+        """
+        ret_data = {}
+        repository = JobRepository()
+        jobs = [dict(job) for job in jobs]
+        missing = resolve_foreign_keys(Job, jobs, exclude=CATEGORY_FIELDS)
+        if any(missing):
+            return [str(ValidationError(errors)) if errors else '' for errors in missing], ret_data
+        try:
+            with transaction.atomic():
+                new_jobs = CreateJobs(repository, jobs).execute()
+                check_constraints()
+        except InvalidBatch as err:
+            return err.errors, ret_data
+        except IntegrityError as err:
+            # The database does not tell which job failed, so all of them did.
+            return [str(err)] * len(jobs), ret_data
+        ret_data.update({'data': new_jobs})
+        return [], ret_data
+
+
+class UpdateJobService:
+    """Service that updates existing jobs."""
+
+    def update_jobs(self, changes: List[Tuple[Job, dict]]) -> BatchRetValue:
+        """Update some fields of many jobs at once, all or none.
+
+        Each job is validated with its new values (see `UpdateJobs`), and all
+        of them are written with set based updates in one transaction.
+
+        Args:
+            changes: list of (job, {field: new_value}) tuples.
+
+        Returns:
+            A tuple with the errors and a dict with the list of jobs updated.
+            Errors is [] when all jobs were updated, otherwise it has one
+            string per job (empty for the valid ones) and nothing is updated.
+
+        Raises:
+            Errors are captured and listed into the return tuple, on the first component.
+            So this does not raises exceptions (or should not).
+
+        """
+        ret_data = {}
+        try:
+            jobs = UpdateJobs(JobRepository(), changes).execute()
+        except InvalidBatch as err:
+            return err.errors, ret_data
+        ret_data.update({'data': jobs})
+        return [], ret_data
+
+
+class DeleteJobService:
+    """Service that soft deletes and restores jobs."""
+
+    def delete_jobs(self, queryset) -> RetValue:
+        """Soft delete every job in queryset.
+
+        Returns:
+            A tuple with a string with any errors and a dict with the number of
+            jobs deleted.
+
+        """
+        return self._set_deleted(queryset, True)
+
+    def restore_jobs(self, queryset) -> RetValue:
+        """Restore every soft deleted job in queryset.
+
+        Returns:
+            A tuple with a string with any errors and a dict with the number of
+            jobs restored.
+
+        """
+        return self._set_deleted(queryset, False)
+
+    def _set_deleted(self, queryset, deleted: bool) -> RetValue:
+        errors = []
+        ret_data = {}
+        try:
+            changed = SetJobsDeleted(JobRepository(), queryset, deleted).execute()
+        except JobError as err:
+            errors.append(str(err))
+        else:
+            ret_data.update({'data': changed})
+        return ','.join(errors), ret_data
@@ -5,18 +5,56 @@ It knows all Models that should be part of the flow and knows
 the API/services of those models. It also orchestrate all the side-effects
 and therefore can make the use of other use cases/services.
 """
+from typing import List, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Model
 from django.utils.translation import gettext as _
 
-from payments_comissions.models import PaymentComission
 from posts.models import Job
-from posts_areas.models import PostArea
 from tektank.internal_services.use_case_interface import UseCaseInterface
+from tektank.libs.validation import full_clean_all
 from tektank.libs_project.helpers import slug_generator
 
-from .errors import InvalidCategories, InvalidDateOrder
+from .categories import post_areas
+from .commands import JobCommand
+from .comissions import payment_comissions
+from .errors import Error, InvalidBatch, InvalidCategories, InvalidDateOrder
 from .interfaces import JobRepositoryInterface
 
 
+class SharedLookups:
+    """Lookups of related rows, memoized.
+
+    A batch of use cases shares one instance, so each amount to pay is
+    resolved once per batch instead of once per job. PostAreas and
+    PaymentComissions come from in-memory tables (see categories and
+    comissions), without queries.
+    """
+
+    def __init__(self):
+        self._payment_comissions = {}
+
+    def post_area(self, value):
+        """Return the PostArea with this name (a str) or id, with its parent linked, or None."""
+        if isinstance(value, str):
+            return post_areas.by_name(value)
+        return post_areas.get(value)
+
+    def payment_comission(self, amount_to_pay):
+        """Return the PaymentComission that applies to amount_to_pay."""
+        if amount_to_pay not in self._payment_comissions:
+            self._payment_comissions[amount_to_pay] = (
+                payment_comissions.assign(amount_to_pay)
+            )
+        return self._payment_comissions[amount_to_pay]
+
+    def prefetch_payment_comissions(self, amounts):
+        """Resolve the comissions of many amounts at once, for a batch."""
+        amounts = [amount for amount in set(amounts) if amount not in self._payment_comissions]
+        self._payment_comissions.update(zip(amounts, payment_comissions.assign_many(amounts)))
+
+
 class CreateJob(UseCaseInterface):
     """Create Job service.
 
@@ -27,13 +65,18 @@ class CreateJob(UseCaseInterface):
     We combine validations here, and validators in the model itself.
 
     Input:
-        Parameters of Job model, i.e. its fields.
+        Parameters of Job model, i.e. its fields (kept in a `JobCommand`).
         repository : A class that will operate against the DB,
                     or any other source to get/put information.
 
+    ``CreateJob.from_command(repository, command)`` takes a `JobCommand`
+    built beforehand, as importers do.
+
     Raises:
         InvalidCategories
         InvalidDateOrder
+        ValidationError: also when a category is given by a name no PostArea
+            has (it is not left empty).
 
     Returns:
         Instance of Job created.
@@ -62,6 +105,7 @@ class CreateJob(UseCaseInterface):
         terms=None,
         deleted=False,
         slug=None,
+        lookups=None,
     ):
         """
 
@@ -72,60 +116,44 @@ class CreateJob(UseCaseInterface):
 
         Fields: slug and payment_comission does not appear, because they are
             set by us. It is not an user input.
+
+        lookups (SharedLookups): to share the lookups of related rows with
+            other use cases, as `CreateJobs` does.
         """
-        # -- Set the internal state of the model for the operation
-        # The fields listed here, should match with the ones defined in the
-        # model definition. And also with only one _ before the field name.
-        self._title = title
-        self._email = email
-        self._date_start = date_start
-        self._date_end = date_end
-        self._amount_to_pay = amount_to_pay
-        self._avatar = avatar
-        self._company = company
-        self._city = city
-        self._state = state
-        self._country = country
-        self._postal_code = postal_code
-        self._post_category = post_category
-        self._post_subcategory = post_subcategory
-        self._address = address
-        self._phone = phone
-        self._cellphone = cellphone
-        self._description = description
-        self._terms = terms
-        # Forces None, as we set them
-        self._slug = None
-        self._payment_comission = None
-        self._deleted = deleted
+        command = JobCommand(
+            title, email, date_start, date_end, amount_to_pay,
+            avatar=avatar,
+            company=company,
+            city=city,
+            state=state,
+            country=country,
+            postal_code=postal_code,
+            post_category=post_category,
+            post_subcategory=post_subcategory,
+            address=address,
+            phone=phone,
+            cellphone=cellphone,
+            description=description,
+            terms=terms,
+            deleted=deleted,
+        )
+        self._setup(repository, command, lookups)
+
+    @classmethod
+    def from_command(cls, repository: JobRepositoryInterface, command: JobCommand,
+                     lookups=None) -> 'CreateJob':
+        """Return the use case for a `JobCommand` built beforehand (importers)."""
+        use_case = cls.__new__(cls)
+        use_case._setup(repository, command, lookups)
+        return use_case
+
+    def _setup(self, repository, command, lookups):
+        # -- The fields of the job, see JobCommand
+        self.__command = command
         # ----- Other objects ----- #
         self.__obj = None
         self.__repository = repository
-        # A list of keys defined in the model. If model is modified, we should
-        # also modify this.
-        self.__model_keys = [
-            'title',
-            'email',
-            'date_start',
-            'date_end',
-            'amount_to_pay',
-            'avatar',
-            'company',
-            'city',
-            'state',
-            'country',
-            'postal_code',
-            'post_category',
-            'post_subcategory',
-            'address',
-            'phone',
-            'cellphone',
-            'description',
-            'terms',
-            'slug',
-            'deleted',
-            'payment_comission',
-        ]
+        self.__lookups = lookups or SharedLookups()
 
     @property
     def repository(self) -> JobRepositoryInterface:
@@ -137,51 +165,56 @@ class CreateJob(UseCaseInterface):
         operation will condense the rest. Will execute side effects, and
         all required operations in order.
         """
-        self._strip_data()
-        # Create an instance of Job, and save it into self.__obj
-        self._factory()
-        self.is_valid()
+        self.prepare()
+        self.__repository.save(self.__obj)
+        return self.__obj
+
+    def prepare(self, clean=True) -> Job:
+        """Validate the data and return the Job to save, with the fields we set.
+
+        Everything `execute` does, but saving. Used to save many jobs at once.
+
+        Args:
+            clean (bool): Run the model validations (see `is_valid`).
+
+        Raises:
+            ValidationError, InvalidDateOrder, InvalidCategories
+        """
+        self.__command.strip()
+        # Builds the Job, with the categories resolved, into self.__obj
+        self.is_valid(clean=clean)
+        if self.__obj is None:
+            self._factory()
         self.__obj.slug = self._generate_slug(  # noqa: T484
             self.__obj.id, self.__obj.title,  # noqa: T484
         )
         self.__obj.payment_comission = self._generate_payment_comission(  # noqa: T484
             self.__obj.amount_to_pay,  # noqa: T484
         )
-        self.__repository.save(self.__obj)
         return self.__obj
 
-    def _strip_data(self):
-        """Clean fields. For example, delete trailing spaces."""
-        fields = [
-            "title",
-            "address_1",
-            "address_2",
-            "email",
-            "website",
-            "phone",
-            "cellphone",
-        ]
-        for field in fields:
-            value = getattr(self, field, None)
-            if value:
-                setattr(self, field, value.strip())
-
-    def is_valid(self):
+    def is_valid(self, clean=True):
         """Public method to allow clients of this object to validate the data even before to execute the use case.
 
         To use it, create an instance of the class with the values desired.
         And execute it.
 
+        Args:
+            clean (bool): Run the model validations. Foreign keys are checked
+                with one query per related table (see `full_clean_all`). False
+                leaves them to the caller, as `CreateJobs` does for a batch.
+
         Returns:
             True or False
 
         Raises:
             ValidationError, InvalidDateOrder, InvalidCategories
         """
+        command = self.__command
 
         # ## Check date order
 
-        if self._date_end and self._date_start and self._date_end <= self._date_start:
+        if command.date_end and command.date_start and command.date_end <= command.date_start:
             raise InvalidDateOrder(_("Start date should be before end date"))
 
         # ## Check categories match.
@@ -189,43 +222,30 @@ class CreateJob(UseCaseInterface):
         # TODO: This should not be necessary, but in admin
         # dropdown menu for selecting categories are not well filtered when selecting parent
         # categorie, so we need to do it.
-        # TODO: Send ID instead of name for better lookup
         # TODO: This logic would go inside posts_category services
-        if self._post_category:
-            assert isinstance(
-                self._post_category, str
-            ), "Category name should be a string"
-        if self._post_subcategory:
-            assert isinstance(
-                self._post_subcategory, str
-            ), "Subcategory name should be a string"
+        # Categories come by name, or already resolved.
         # If user selected both categories, check that the parent is the correct
         # If only subcategory selected, fill the right parent.
         # If only category, do nothing.
-        cat = (
-            PostArea.objects.find_by_name(self._post_category)
-            if self._post_category
-            else None
-        )
-        subcat = (
-            PostArea.objects.find_by_name(self._post_subcategory)
-            if self._post_subcategory
-            else None
-        )
+        cat = self._post_area('post_category', command.post_category)
+        subcat = self._post_area('post_subcategory', command.post_subcategory)
         if subcat:
             if cat and subcat.parent != cat:
                 raise InvalidCategories(cat.name, subcat.name)
             else:
-                self._post_category = subcat.parent.name
+                cat = subcat.parent
+        command.post_category, command.post_subcategory = cat, subcat
 
         # Here at the end, as before this, we were cleaning and validating all
         # fields, so it has sense that at this point, the model will be in the
         # final state.
-        # If object is not stored locally, do it.
-        if not self.__obj:
-            self._factory()
+        # Built here (and again, if it was before) as categories were resolved.
+        self._factory()
         # ## Execute programatically model validations. Raises validation error.
-        self.__obj.full_clean()
+        if clean:
+            error = full_clean_all([self.__obj])[0]
+            if error is not None:
+                raise error
 
         return True
 
@@ -240,21 +260,228 @@ class CreateJob(UseCaseInterface):
         job.
         The rules of how we are going to calculate this, are done by us.
         """
-        return PaymentComission.assign_payment_comission(amount_to_pay)
+        return self.__lookups.payment_comission(amount_to_pay)
+
+    def _post_area(self, field, value):
+        """Return the PostArea of value, a name, an id or a PostArea, or None.
+
+        Raises:
+            ValidationError: if there is no PostArea with that name or id.
+        """
+        if value is None or value == '' or isinstance(value, Model):
+            return value or None
+        area = self.__lookups.post_area(value)
+        if area is None:
+            raise ValidationError({field: [_("Unknown category %s") % value]})
+        return area
 
     def _factory(self):
         """Create an instance of a Job, and save it into self.__obj."""
-        # Check if it is a field in the model # TODO do it better?
-
-        # Remove _ from keys, so we pass correct arguments to create,
-        # and leave only values that are not None.
-        def process(s):
-            if s[0] == '_' and s[1] != '_' and s[1:] in self.__model_keys:
-                return s[1:]
-
-        params = {
-            process(k): v
-            for k, v in self.__dict__.items()
-            if v is not None and process(k)
-        }
-        self.__obj = self.__repository.factory(**params)
+        self.__obj = self.__repository.factory(**self.__command.job_kwargs())
+
+
+class CreateJobs(UseCaseInterface):
+    """Create many Jobs at once.
+
+    Every job goes through the same validations as in `CreateJob`, sharing the
+    lookups of related rows, and then all of them are inserted together. It is
+    all or nothing: if any job is invalid, none is created.
+
+    Input:
+        repository : A class that will operate against the DB.
+        jobs : List of dicts, each one with the parameters of `CreateJob`,
+            or of `JobCommand`.
+
+    Raises:
+        InvalidBatch: with the errors of each job.
+
+    Returns:
+        List of Jobs created, in the same order.
+    """
+
+    def __init__(self, repository: JobRepositoryInterface, jobs: List[dict]):
+        self.__repository = repository
+        self.__jobs = jobs
+        self.__objs = None
+
+    @property
+    def repository(self) -> JobRepositoryInterface:
+        """Return the respository (adapter) used."""
+        return self.__repository
+
+    def execute(self) -> List[Job]:
+        """Validate every job, and insert them all in one go."""
+        if self.__objs is None:
+            self.is_valid()
+        jobs = self.__repository.bulk_create(self.__objs)
+        return jobs
+
+    def is_valid(self):
+        """Validate every job of the batch.
+
+        Returns:
+            True
+
+        Raises:
+            InvalidBatch: with one error message per job, empty for valid ones.
+        """
+        lookups = SharedLookups()
+        lookups.prefetch_payment_comissions(
+            params.amount_to_pay if isinstance(params, JobCommand)
+            else params.get('amount_to_pay')
+            for params in self.__jobs
+        )
+        objs, errors = [], []
+        for params in self.__jobs:
+            try:
+                if isinstance(params, JobCommand):
+                    use_case = CreateJob.from_command(self.__repository, params, lookups)
+                else:
+                    use_case = CreateJob(self.__repository, lookups=lookups, **params)
+                objs.append(use_case.prepare(clean=False))
+            except (Error, ValidationError) as err:
+                objs.append(None)
+                errors.append(str(err))
+            else:
+                errors.append('')
+        # Model validations of the whole batch, with its foreign keys checked
+        # together.
+        prepared = [index for index, obj in enumerate(objs) if obj is not None]
+        clean_errors = full_clean_all([objs[index] for index in prepared])
+        for index, error in zip(prepared, clean_errors):
+            if error is not None:
+                errors[index] = str(error)
+        if any(errors):
+            raise InvalidBatch(errors)
+        self.__objs = objs
+        return True
+
+
+class UpdateJobs(UseCaseInterface):
+    """Update some fields of many Jobs at once.
+
+    Each job is validated as on creation, with the new values: date order,
+    categories that belong together and the model validations of the changed
+    fields. If the amount to pay changes, the payment comission is assigned
+    again. Then all of them are written with set based updates. It is all or
+    nothing: if any job is invalid, none is updated.
+
+    Input:
+        repository : A class that will operate against the DB.
+        changes : List of (job, {field: new_value}) tuples.
+
+    Raises:
+        InvalidBatch: with the errors of each job.
+
+    Returns:
+        List of Jobs updated, in the same order.
+    """
+
+    def __init__(self, repository: JobRepositoryInterface, changes: List[Tuple[Job, dict]]):
+        self.__repository = repository
+        self.__changes = changes
+        self.__valid_changes = None
+
+    @property
+    def repository(self) -> JobRepositoryInterface:
+        """Return the respository (adapter) used."""
+        return self.__repository
+
+    def execute(self) -> List[Job]:
+        """Validate every change, and write them all in one go."""
+        if self.__valid_changes is None:
+            self.is_valid()
+        jobs = self.__repository.bulk_update_fields(self.__valid_changes)
+        return jobs
+
+    def is_valid(self):
+        """Validate every job of the batch with its new values.
+
+        Returns:
+            True
+
+        Raises:
+            InvalidBatch: with one error message per job, empty for valid ones.
+        """
+        lookups = SharedLookups()
+        valid_changes, errors = [], []
+        for instance, fields in self.__changes:
+            try:
+                fields = self._validate(instance, dict(fields), lookups)
+            except (Error, ValidationError) as err:
+                errors.append(str(err))
+            else:
+                valid_changes.append((instance, fields))
+                errors.append('')
+        if any(errors):
+            raise InvalidBatch(errors)
+        self.__valid_changes = valid_changes
+        return True
+
+    def _validate(self, instance: Job, fields: dict, lookups: SharedLookups) -> dict:
+        """Validate a job with the fields changed, and return the fields to write.
+
+        Fields we derive (category from subcategory, payment comission) are
+        added to the ones to write. The values returned are the cleaned ones
+        (``clean_fields`` normalizes them on the instance), not the raw input.
+        """
+        for attr, val in fields.items():
+            setattr(instance, attr, val)
+
+        if instance.date_end and instance.date_start and instance.date_end <= instance.date_start:
+            raise InvalidDateOrder(_("Start date should be before end date"))
+
+        if {'post_category', 'post_subcategory'}.intersection(fields):
+            cat, subcat = instance.post_category, instance.post_subcategory
+            if subcat:
+                if cat and subcat.parent_id != cat.pk:
+                    raise InvalidCategories(cat.name, subcat.name)
+                elif not cat:
+                    instance.post_category = fields['post_category'] = subcat.parent
+
+        if 'amount_to_pay' in fields:
+            instance.payment_comission = fields['payment_comission'] = (
+                lookups.payment_comission(instance.amount_to_pay)
+            )
+
+        # Model validations, only of what changed (the rest was valid already).
+        exclude = [f.name for f in instance._meta.fields if f.name not in fields]
+        instance.clean_fields(exclude=exclude)
+        instance.clean()
+        return {attr: getattr(instance, attr) for attr in fields}
+
+
+class SetJobsDeleted(UseCaseInterface):
+    """Soft delete, or restore, many Jobs at once.
+
+    Jobs are marked with the ``deleted`` flag of PersistentModel (they are
+    not removed), with set based updates over the queryset.
+
+    Input:
+        repository : A class that will operate against the DB.
+        queryset : Jobs to change.
+        deleted : True to delete them, False to restore them.
+
+    Returns:
+        Number of jobs changed.
+    """
+
+    def __init__(self, repository: JobRepositoryInterface, queryset, deleted=True):
+        self.__repository = repository
+        self.__queryset = queryset
+        self.__deleted = deleted
+
+    @property
+    def repository(self) -> JobRepositoryInterface:
+        """Return the respository (adapter) used."""
+        return self.__repository
+
+    def execute(self) -> int:
+        self.is_valid()
+        return self.__repository.set_deleted(self.__queryset, self.__deleted)
+
+    def is_valid(self):
+        """Only jobs can be deleted here."""
+        if not issubclass(self.__queryset.model, Job):
+            raise Error(_("Only jobs can be deleted"))
+        return True
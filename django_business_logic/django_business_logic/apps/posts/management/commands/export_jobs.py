@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Export jobs as CSV to a file, for exports too big for the admin download.
+
+The file gets a random name under EXPORTS_ROOT, which is not served, and is
+only readable by the user running the command. Columns are the ones of the
+admin export.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.admin import JobAdmin
+from posts.models import Job
+from tektank.libs.export import export_field_names, write_csv_export
+
+
+class Command(BaseCommand):
+    help = 'Export jobs as CSV to a private file, and print its path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-deleted', action='store_true',
+            help='Export soft deleted jobs too.',
+        )
+        parser.add_argument(
+            '--output-dir', default=settings.EXPORTS_ROOT,
+            help='Directory to write to (EXPORTS_ROOT by default), never a served one.',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Job.objects.all()
+        if not options['include_deleted']:
+            queryset = queryset.filter(deleted=False)
+        try:
+            path = write_csv_export(
+                queryset.order_by('created_at'),
+                export_field_names(Job, JobAdmin.export_exclude),
+                options['output_dir'],
+                'jobs',
+                chunk_size=JobAdmin.export_chunk_size,
+            )
+        except OSError as err:
+            raise CommandError('Export failed: {}'.format(err))
+        self.stdout.write(path)
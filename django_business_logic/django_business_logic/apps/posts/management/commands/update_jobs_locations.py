@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Copy the coordinates of the postal code (or city) of every job to it.
+
+Writes through the repository keep them current, this is for existing rows
+(after adding the fields) or after loading new places data.
+"""
+from django.core.management.base import BaseCommand
+
+from posts.internal_services.cache import jobs_cache
+from posts.internal_services.locations import COORDINATE_FIELDS, LOCATION_FIELDS, locate
+from posts.models import Job
+from tektank.libs.bulk import bulk_update
+
+
+class Command(BaseCommand):
+    help = 'Recompute latitude and longitude of all jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = Job.objects.only('pk', *LOCATION_FIELDS).order_by('pk')
+        updated = 0
+        last_pk = None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            jobs = list(chunk[:chunk_size])
+            if not jobs:
+                break
+            locate(jobs)
+            updated += bulk_update(jobs, COORDINATE_FIELDS, batch_size=chunk_size)
+            last_pk = jobs[-1].pk
+        jobs_cache.bump_on_commit()
+        self.stdout.write('Updated coordinates of {} jobs.'.format(updated))
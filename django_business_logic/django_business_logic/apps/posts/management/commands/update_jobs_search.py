@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Recompute the full text search document of every job.
+
+Writes through the repository keep it current, this is for existing rows
+(after adding the field) or after changing JOBS_SEARCH_CONFIG. Soft deleted
+jobs are not indexed.
+"""
+from django.core.management.base import BaseCommand
+
+from posts.internal_services.cache import jobs_cache
+from posts.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Recompute search_vector of all jobs not deleted.'
+
+    def handle(self, *args, **options):
+        updated = Job.objects.filter(deleted=False).update(
+            search_vector=Job.search_document(),
+        )
+        jobs_cache.bump_on_commit()
+        self.stdout.write('Updated search document of {} jobs.'.format(updated))
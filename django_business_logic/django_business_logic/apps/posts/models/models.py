@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 """Models representing posts, now only jobs."""
-from django.contrib.postgres.indexes import BrinIndex
+from django.conf import settings
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import ugettext_lazy as _
 
 from tektank.libs.models import AuditedModel, PersistentModel, UUIDPrimaryKey
 
+# Text fields of a post whose surrounding whitespace is dropped.
+STRIPPED_FIELDS = ("title", "email", "address", "phone", "cellphone")
+
 
 class PostModel(UUIDPrimaryKey, AuditedModel):
     """Abstract model with basic info of a post.
@@ -65,6 +70,12 @@ class PostModel(UUIDPrimaryKey, AuditedModel):
     | slug             | SlugField             |       |  Slug field. Always overwriten when model is saved. It is |
     |                  |                       |       |  formed like "<title[:128]>-<hashed pk>"                  |
     +------------------+-----------------------+-------+-----------------------------------------------------------+
+    | search_vector    | SearchVectorField     |  Yes  |  Full text search document of title and description.      |
+    |                  |                       |       |  Not editable, kept current by the repository on writes.  |
+    +------------------+-----------------------+-------+-----------------------------------------------------------+
+    | latitude         | FloatField            |  Yes  |  Coordinates of the postal code, or else the city. Not    |
+    | longitude        | FloatField            |  Yes  |  editable, kept current by the repository on writes.      |
+    +------------------+-----------------------+-------+-----------------------------------------------------------+
 
     """
 
@@ -163,6 +174,11 @@ class PostModel(UUIDPrimaryKey, AuditedModel):
     slug = models.SlugField(
         verbose_name=_("slug"), max_length=151, null=True, blank=True,
     )
+    # Full text search over title and description. See search_document().
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    # Copied from postal_code/city, so distance searches do not join them.
+    latitude = models.FloatField(_("latitude"), null=True, blank=True, editable=False)
+    longitude = models.FloatField(_("longitude"), null=True, blank=True, editable=False)
 
     # Payment data
     # TODO: Complete
@@ -177,6 +193,8 @@ class PostModel(UUIDPrimaryKey, AuditedModel):
             BrinIndex(fields=["date_start"]),
             BrinIndex(fields=["date_end"]),
             models.Index(fields=["amount_to_pay"]),
+            # Keyset pagination ordering, see api_v1.pagination
+            models.Index(fields=["created_at", "id"]),
             # FK Fields
             models.Index(fields=["postal_code"]),
             models.Index(fields=["city"]),
@@ -186,24 +204,31 @@ class PostModel(UUIDPrimaryKey, AuditedModel):
             models.Index(fields=["post_category"]),
             models.Index(fields=["post_subcategory"]),
             models.Index(fields=["payment_comission"]),
+            # Full text search
+            GinIndex(fields=["search_vector"]),
+            # Bounding box prefilter of distance searches, see libs.geo
+            models.Index(fields=["latitude", "longitude"]),
         )
 
     def __str__(self):
         return self.title
 
+    @staticmethod
+    def search_document():
+        """Return the expression that computes `search_vector` in the database.
+
+        Title weights more than description when ranking results.
+        """
+        config = settings.JOBS_SEARCH_CONFIG
+        return (
+            SearchVector("title", weight="A", config=config)
+            + SearchVector("description", weight="B", config=config)
+        )
+
     def clean(self, *args, **kwargs):
         """Strip whitespaces."""
-        fields = [
-            "title",
-            "address_1",
-            "address_2",
-            "email",
-            "website",
-            "phone",
-            "cellphone",
-        ]
-        for field in fields:
-            value = getattr(self, field, None)
+        for field in STRIPPED_FIELDS:
+            value = getattr(self, field)
             if value:
                 setattr(self, field, value.strip())
 
@@ -213,6 +238,16 @@ class PostModel(UUIDPrimaryKey, AuditedModel):
         return reverse("v1:posts-detail", kwargs={"slug": self.slug})
 
 
+# Indexes of PostModel made redundant by the composite ones of Job.
+REPLACED_BY_ACTIVE_INDEXES = (
+    ["date_end"],
+    ["post_category"],
+    ["post_subcategory"],
+    ["city"],
+    ["company"],
+)
+
+
 class Job(PostModel, PersistentModel):
     """Proposal of jobs.
 
@@ -222,10 +257,25 @@ class Job(PostModel, PersistentModel):
     Inherit from `PostModel`_
     """
 
-    class Meta:
+    class Meta(PostModel.Meta):
+        # Extends PostModel.Meta, otherwise its indexes are not inherited.
         verbose_name = _("job")
         verbose_name_plural = _("jobs")
         app_label = 'posts'
+        # Composite indexes shaped like ActiveJob queries: equality on the
+        # filtered column and on deleted, then the range on date_end.
+        # They replace the single column indexes on the same leading column
+        # and the BRIN on date_end, that is poorly correlated with inserts.
+        indexes = tuple(
+            index for index in PostModel.Meta.indexes
+            if index.fields not in REPLACED_BY_ACTIVE_INDEXES
+        ) + (
+            models.Index(fields=["deleted", "date_end"]),
+            models.Index(fields=["post_category", "deleted", "date_end"]),
+            models.Index(fields=["post_subcategory", "deleted", "date_end"]),
+            models.Index(fields=["city", "deleted", "date_end"]),
+            models.Index(fields=["company", "deleted", "date_end"]),
+        )
 
     def get_absolute_url(self):
         """Return absolute url for a job element."""
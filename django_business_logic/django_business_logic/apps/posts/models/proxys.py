@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 """Proxy models to implement heavy logic in them. Manager and queryset so methods are chainable."""
+from django.db.models import Case, CharField, Value, When
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
@@ -22,11 +23,26 @@ class ActiveJobQuerySet(PersistentModelQuerySet):
     For achieving that, we have to call this methods from the manager.
     """
 
+    # Jobs paying more than this are great payed, less is not great payed.
+    GREAT_PAYED_AMOUNT = 50
+
     def great_payed(self):
-        return self.filter(amount_to_pay__gt=50)
+        return self.filter(amount_to_pay__gt=self.GREAT_PAYED_AMOUNT)
 
     def no_great_payed(self):
-        return self.filter(amount_to_pay__lt=50)
+        return self.filter(amount_to_pay__lt=self.GREAT_PAYED_AMOUNT)
+
+    @classmethod
+    def payment_bucket(cls):
+        """Expression with the name of the method that selects each job.
+
+        "great_payed", "no_great_payed", or null (exactly the amount).
+        """
+        return Case(
+            When(amount_to_pay__gt=cls.GREAT_PAYED_AMOUNT, then=Value("great_payed")),
+            When(amount_to_pay__lt=cls.GREAT_PAYED_AMOUNT, then=Value("no_great_payed")),
+            output_field=CharField(),
+        )
 
 
 class ActiveJobManager(PersistentModelManager):
@@ -40,8 +56,10 @@ class ActiveJobManager(PersistentModelManager):
     """
 
     def get_queryset(self):
+        # Deleted jobs are not active either. Matches the (..., deleted, date_end)
+        # indexes of Job.
         return ActiveJobQuerySet(self.model, using=self._db).filter(
-            date_end__gt=timezone.now(),
+            deleted=False, date_end__gt=timezone.now(),
         )
 
     def great_payed(self):
@@ -56,7 +74,7 @@ class ActiveJob(Job):
 
     Job proxy model, to filter active (not expired) jobs.
     Active jobs will be the ones that the end date it's after the actual date
-    , i.e. now
+    , i.e. now, and that are not deleted.
 
     This model will NOT create a new table in the database.
     """
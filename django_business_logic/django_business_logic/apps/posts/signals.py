@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 """Signals for posts model."""
-from django.db.models.signals import pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from posts.internal_services.categories import post_areas
+from posts.internal_services.comissions import payment_comissions
 from posts.models import Job
 from tektank.libs_project.helpers import slug_generator
 
@@ -13,3 +16,17 @@ def generate_slug(sender, instance, **kwargs):
     """Generate slug field. Slugifying the title and appending ",hashedid"."""
     # Always generate it
     instance.slug = slug_generator(instance)
+
+
+@receiver(post_save, sender="posts_areas.PostArea")
+@receiver(post_delete, sender="posts_areas.PostArea")
+def invalidate_post_areas(sender, **kwargs):
+    """Forget the in-memory PostArea tree once the change is committed."""
+    transaction.on_commit(post_areas.invalidate)
+
+
+@receiver(post_save, sender="payments_comissions.PaymentComission")
+@receiver(post_delete, sender="payments_comissions.PaymentComission")
+def invalidate_payment_comissions(sender, **kwargs):
+    """Forget the in-memory comission brackets once the change is committed."""
+    transaction.on_commit(payment_comissions.invalidate)
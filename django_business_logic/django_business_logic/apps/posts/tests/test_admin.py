@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import os
+import stat
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+import factory
+from django.contrib.admin.sites import AdminSite
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+# To create fake data
+from faker import Factory
+
+from posts.admin import JobAdmin
+from posts.models import Job
+from posts_areas.models import PostArea
+
+faker = Factory.create()
+
+
+class JobFactory(factory.DjangoModelFactory):
+    class Meta:
+        model = Job
+
+    title = faker.word()
+    email = faker.email()
+    date_start = timezone.now()
+    date_end = timezone.now() + timedelta(hours=3)
+    amount_to_pay = faker.random_number(1, 100)
+
+
+class JobAdminExportTest(TestCase):
+    """ Test module for the CSV export of the Job admin """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.category = PostArea.objects.create(name="Software")
+        cls.jobs = [JobFactory(post_category=cls.category) for _ in range(5)]
+        cls.admin = JobAdmin(Job, AdminSite())
+
+    def _lines(self, response):
+        return b"".join(response.streaming_content).decode("utf-8").splitlines()
+
+    def test_export_streams_every_row(self):
+        response = self.admin.export_as_csv(None, Job.objects.all())
+        lines = self._lines(response)
+        header = lines[0].split(",")
+        self.assertNotIn("search_vector", header)
+        self.assertEqual(len(lines), len(self.jobs) + 1)
+        self.assertIn("Software", lines[1])
+
+    def test_related_names_resolved_per_chunk(self):
+        admin = JobAdmin(Job, AdminSite())
+        admin.export_chunk_size = 2
+        response = admin.export_as_csv(None, Job.objects.all())
+        # 1 to read the rows, and one per chunk for each of the filled FKs.
+        with self.assertNumQueries(1 + 3):
+            self._lines(response)
+
+    def test_no_background_export(self):
+        # Exports hold emails and phones: they are only streamed to the admin
+        # who asked, never written to (public) storage.
+        self.assertNotIn("export_as_csv_offline", JobAdmin.actions)
+        self.assertFalse(hasattr(self.admin, "export_as_csv_offline"))
+
+
+class ExportJobsCommandTest(TestCase):
+    """ Test module for the export_jobs management command """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.jobs = [JobFactory() for _ in range(3)]
+        cls.deleted = JobFactory(deleted=True)
+
+    def _export(self, *args):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            call_command("export_jobs", "--output-dir", directory, *args, stdout=out)
+            path = out.getvalue().strip()
+            self.assertEqual(os.path.dirname(path), directory)
+            self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+            with open(path) as export_file:
+                return os.path.basename(path), mode, export_file.read().splitlines()
+
+    def test_private_file(self):
+        name, mode, lines = self._export()
+        self.assertEqual(mode, 0o600)
+        self.assertTrue(name.startswith("jobs-"))
+        self.assertEqual(len(lines), len(self.jobs) + 1)
+        self.assertNotIn("search_vector", lines[0].split(","))
+
+    def test_include_deleted(self):
+        _, _, lines = self._export("--include-deleted")
+        self.assertEqual(len(lines), len(self.jobs) + 2)
+
+    def test_failure_is_reported(self):
+        with tempfile.NamedTemporaryFile() as not_a_directory:
+            with self.assertRaises(CommandError):
+                call_command("export_jobs", "--output-dir", not_a_directory.name)
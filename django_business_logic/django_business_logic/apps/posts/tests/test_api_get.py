@@ -1,19 +1,29 @@
 # -*- coding: utf-8 -*-
 import json
+from base64 import urlsafe_b64encode
 from datetime import timedelta
+from unittest.mock import patch
 
 import factory
-from django.test import TestCase
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from django.utils import timezone
 
 # To create fake data
 from faker import Factory
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-from posts.api_v1.serializers import JobSerializer
+from posts.api_v1.pagination import JobLimitOffsetPagination
+from posts.api_v1.serializers import ActiveJobSerializer, JobSerializer
+from posts.internal_services.cache import jobs_cache
+from posts.internal_services.categories import post_areas
+from posts.internal_services.services import CreateJobService
 from posts.models import ActiveJob, Job
+from posts_areas.models import PostArea
 from tektank.libs_project.helpers import slug_generator
 
 # initialize the APIClient app
@@ -172,3 +182,521 @@ class GetActiveJobTest(TestCase):
         response = client.get(reverse(self.url_detail, kwargs={"slug": slug}))
         # Lo traemos desde la base
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CursorPaginationJobTest(TestCase):
+    """ Test module for the opt-in cursor pagination of the Job APIs """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.jobs = [JobFactory() for _ in range(5)]
+        cls.url_list = "v1:posts-job-list"
+
+    def test_walk_all_pages(self):
+        response = client.get(reverse(self.url_list), {"pagination": "cursor", "limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        seen = [job["id"] for job in response.data["results"]]
+        while response.data["next"]:
+            response = client.get(response.data["next"])
+            seen += [job["id"] for job in response.data["results"]]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), {str(job.id) for job in self.jobs})
+
+    def test_previous_link_goes_back(self):
+        first = client.get(reverse(self.url_list), {"pagination": "cursor", "limit": 2})
+        second = client.get(first.data["next"])
+        back = client.get(second.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+
+    def test_page_does_not_count(self):
+        first = client.get(reverse(self.url_list), {"pagination": "cursor", "limit": 2})
+        # Only the page itself, no COUNT(*)
+        with self.assertNumQueries(1):
+            client.get(first.data["next"])
+
+    def test_invalid_cursor(self):
+        response = client.get(reverse(self.url_list), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        for position in (["x", "y"], [None, None], [1, 2]):
+            cursor = urlsafe_b64encode(
+                json.dumps({"r": 0, "p": position}).encode("utf-8")
+            ).decode("ascii")
+            response = client.get(reverse(self.url_list), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ListQueryCountTest(TestCase):
+    """ Pin the number of queries issued to render a list page.
+
+    A page costs the COUNT plus the page itself, whatever the number of rows
+    and the categories they point to.
+    """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        for i in range(10):
+            category = PostArea.objects.create(name="category {}".format(i))
+            subcategory = PostArea.objects.create(
+                name="subcategory {}".format(i), parent=category,
+            )
+            JobFactory(post_category=category, post_subcategory=subcategory)
+
+    def setUp(self):
+        # Warm the table size estimate, it is remembered for a while.
+        client.get(reverse("v1:posts-job-list"))
+
+    def test_job_list_queries(self):
+        with self.assertNumQueries(2):
+            response = client.get(reverse("v1:posts-job-list"))
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_active_job_list_queries(self):
+        with self.assertNumQueries(2):
+            response = client.get(reverse("v1:posts-activejob-list"))
+        self.assertEqual(len(response.data["results"]), 10)
+
+
+class SparseFieldsetTest(TestCase):
+    """ Test module for ?fields= and ?omit= on the ActiveJob API """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.job = JobFactory(description="a long description", terms="terms")
+        cls.url_list = "v1:posts-activejob-list"
+
+    def test_only_requested_fields(self):
+        fields = ["slug", "title", "amount_to_pay", "date_end"]
+        response = client.get(reverse(self.url_list), {"fields": ",".join(fields)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["results"][0].keys()), set(fields))
+
+    def test_omitted_fields(self):
+        response = client.get(reverse(self.url_list), {"omit": "description,terms"})
+        job = response.data["results"][0]
+        self.assertNotIn("description", job)
+        self.assertNotIn("terms", job)
+        self.assertIn("title", job)
+
+    def test_text_columns_are_not_read(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(reverse(self.url_list), {"fields": "slug,title"})
+        page_query = ctx.captured_queries[-1]["sql"]
+        self.assertNotIn('"description"', page_query)
+        self.assertNotIn('"terms"', page_query)
+
+
+class ActiveJobValuesListTest(TestCase):
+    """ The values() list of ActiveJobs renders the same as the serializer """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        category = PostArea.objects.create(name="category")
+        subcategory = PostArea.objects.create(name="subcategory", parent=category)
+        JobFactory(post_category=category, post_subcategory=subcategory, phone="123")
+        JobFactory(description="", address=None)
+        cls.url_list = "v1:posts-activejob-list"
+
+    def _expected(self, params=None):
+        request = Request(APIRequestFactory().get(reverse(self.url_list), params))
+        jobs = ActiveJob.objects.order_by("-created_at", "-id")
+        serializer = ActiveJobSerializer(jobs, many=True, context={"request": request})
+        return JSONRenderer().render(serializer.data)
+
+    def test_same_output_as_serializer(self):
+        response = client.get(reverse(self.url_list), {"pagination": "cursor"})
+        self.assertEqual(JSONRenderer().render(response.data["results"]), self._expected())
+
+    def test_same_output_with_sparse_fieldset(self):
+        params = {"pagination": "cursor", "fields": "slug,title,post_category"}
+        response = client.get(reverse(self.url_list), params)
+        self.assertEqual(
+            JSONRenderer().render(response.data["results"]), self._expected(params),
+        )
+
+
+@patch.object(jobs_cache, "timeout", 60)
+class ActiveJobListCacheTest(TestCase):
+    """ Test module for the cache of the ActiveJob listings """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.url_list = "v1:posts-activejob-list"
+
+    def setUp(self):
+        jobs_cache.bump()
+
+    def test_second_request_is_a_hit(self):
+        JobFactory()
+        first = client.get(reverse(self.url_list), {"min_payment": 0})
+        with self.assertNumQueries(0):
+            second = client.get(reverse(self.url_list), {"min_payment": " 0"})
+        self.assertEqual(first.data, second.data)
+
+    def test_other_filters_are_other_entries(self):
+        JobFactory(amount_to_pay=10)
+        client.get(reverse(self.url_list), {"min_payment": 0})
+        response = client.get(reverse(self.url_list), {"min_payment": 20})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_stats(self):
+        before = jobs_cache.stats()
+        client.get(reverse(self.url_list))
+        client.get(reverse(self.url_list))
+        after = jobs_cache.stats()
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+
+@patch.object(jobs_cache, "timeout", 60)
+class ActiveJobListCacheInvalidationTest(TransactionTestCase):
+    """ Writes invalidate the cached listings once they are committed """
+
+    url_list = "v1:posts-activejob-list"
+
+    def setUp(self):
+        jobs_cache.bump()
+
+    def test_write_invalidates(self):
+        client.get(reverse(self.url_list))
+        errors, _ = CreateJobService().create_job(
+            title="new job",
+            email="fake@gmail.com",
+            date_start=timezone.now(),
+            date_end=timezone.now() + timedelta(hours=3),
+            amount_to_pay=10,
+        )
+        self.assertEqual(errors, "")
+        response = client.get(reverse(self.url_list))
+        self.assertEqual(response.data["count"], 1)
+
+    def test_bump_waits_for_the_commit(self):
+        generation = jobs_cache.generation()
+        with transaction.atomic():
+            jobs_cache.bump_on_commit()
+            self.assertEqual(jobs_cache.generation(), generation)
+        self.assertNotEqual(jobs_cache.generation(), generation)
+
+    def test_rollback_does_not_bump(self):
+        generation = jobs_cache.generation()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                jobs_cache.bump_on_commit()
+                raise RuntimeError
+        self.assertEqual(jobs_cache.generation(), generation)
+
+
+class ConditionalRetrieveTest(TestCase):
+    """ Test module for ETag / Last-Modified on job retrieve """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.job = JobFactory()
+        cls.job.slug = slug_generator(cls.job.id, cls.job.title)
+        cls.job.save()
+
+    def _url(self, name):
+        return reverse(name, kwargs={"slug": self.job.slug})
+
+    def test_headers_are_sent(self):
+        for name in ("v1:posts-job-detail", "v1:posts-activejob-detail"):
+            response = client.get(self._url(name))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("ETag", response)
+            self.assertIn("Last-Modified", response)
+
+    def test_if_none_match(self):
+        url = self._url("v1:posts-job-detail")
+        etag = client.get(url)["ETag"]
+        # Only the version query, the job is not loaded
+        with self.assertNumQueries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        url = self._url("v1:posts-activejob-detail")
+        last_modified = client.get(url)["Last-Modified"]
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changed_job_is_sent_again(self):
+        url = self._url("v1:posts-job-detail")
+        etag = client.get(url)["ETag"]
+        self.job.title = "other title"
+        self.job.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_patch_changes_etag(self):
+        url = self._url("v1:posts-job-detail")
+        etag = client.get(url)["ETag"]
+        response = client.patch(url, {"title": "patched title"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_fieldset_changes_etag(self):
+        url = self._url("v1:posts-job-detail")
+        etag = client.get(url)["ETag"]
+        response = client.get(url, {"fields": "title"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class FullTextSearchTest(TestCase):
+    """ Test module for ?q= full text search on the ActiveJob API """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        service = CreateJobService()
+        data = {
+            "email": "fake@gmail.com",
+            "date_start": timezone.now(),
+            "date_end": timezone.now() + timedelta(hours=3),
+            "amount_to_pay": 10,
+        }
+        _, cls.in_title = service.create_job(title="Testing mobile apps", **data)
+        _, cls.in_description = service.create_job(
+            title="Some job", description="We need testers for our mobile game", **data
+        )
+        _, cls.other = service.create_job(title="Review a website", **data)
+        cls.url_list = "v1:posts-activejob-list"
+
+    def test_search_ranks_title_first(self):
+        response = client.get(reverse(self.url_list), {"q": "mobile"})
+        ids = [job["id"] for job in response.data["results"]]
+        self.assertEqual(
+            ids, [str(self.in_title["data"].id), str(self.in_description["data"].id)],
+        )
+
+    def test_update_fields_keeps_search_current(self):
+        from posts.internal_services.adapters import JobRepository
+
+        job = self.other["data"]
+        JobRepository().update_fields(job, {"title": "Review a mobile website"})
+        response = client.get(reverse(self.url_list), {"q": "mobile"})
+        self.assertIn(str(job.id), [job["id"] for job in response.data["results"]])
+
+
+class CategoryFilterTest(TestCase):
+    """ Test module for the category filters of the ActiveJob API """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        design = PostArea.objects.create(name="Design")
+        web = PostArea.objects.create(name="Web Design", parent=design)
+        games = PostArea.objects.create(name="Games")
+        cls.design_job = JobFactory(post_category=design, post_subcategory=web)
+        cls.games_job = JobFactory(post_category=games)
+        cls.url_list = "v1:posts-activejob-list"
+
+    def setUp(self):
+        post_areas.reload()
+
+    def _ids(self, params):
+        response = client.get(reverse(self.url_list), params)
+        return {job["id"] for job in response.data["results"]}
+
+    def test_category_contains(self):
+        self.assertEqual(self._ids({"post_category": "desi"}), {str(self.design_job.id)})
+        self.assertEqual(self._ids({"post_category": "GAMES"}), {str(self.games_job.id)})
+
+    def test_subcategory(self):
+        self.assertEqual(self._ids({"post_subcategory": "web"}), {str(self.design_job.id)})
+
+    def test_unknown_category(self):
+        self.assertEqual(self._ids({"post_category": "nothing"}), set())
+
+    def test_no_join_with_post_area(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(reverse(self.url_list), {"post_category": "design", "fields": "id"})
+        self.assertNotIn("LIKE", ctx.captured_queries[-1]["sql"])
+
+
+class ActiveJobIndexesTest(TestCase):
+    """ The ActiveJob predicate is served by the composite indexes of Job """
+
+    def test_composite_indexes(self):
+        indexed = [index.fields for index in Job._meta.indexes]
+        for column in ("post_category", "post_subcategory", "city", "company"):
+            self.assertIn([column, "deleted", "date_end"], indexed)
+            # The single column index is redundant now
+            self.assertNotIn([column], indexed)
+        self.assertIn(["deleted", "date_end"], indexed)
+
+    def test_deleted_jobs_are_not_active(self):
+        job = JobFactory(deleted=True)
+        self.assertFalse(ActiveJob.objects.filter(pk=job.pk).exists())
+
+
+class EstimatedCountTest(TestCase):
+    """ Test module for the estimated counts of the Job list API """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        for _ in range(5):
+            JobFactory()
+        cls.url_list = "v1:posts-job-list"
+
+    def test_small_tables_are_counted(self):
+        response = client.get(reverse(self.url_list))
+        self.assertEqual(response.data["count"], 5)
+        self.assertTrue(response.data["count_is_exact"])
+
+    @patch.object(JobLimitOffsetPagination, "count_estimate_threshold", 2)
+    @patch("tektank.libs.pagination.table_estimate", return_value=1000)
+    @patch("tektank.libs.pagination.queryset_estimate", return_value=1000)
+    def test_big_tables_are_estimated(self, mock_query_estimate, mock_estimate):
+        response = client.get(reverse(self.url_list), {"limit": 2})
+        self.assertEqual(response.data["count"], 1000)
+        self.assertFalse(response.data["count_is_exact"])
+        self.assertIsNotNone(response.data["next"])
+
+    @patch.object(JobLimitOffsetPagination, "count_estimate_threshold", 2)
+    @patch("tektank.libs.pagination.table_estimate", return_value=1000)
+    @patch("tektank.libs.pagination.queryset_estimate", return_value=1000)
+    def test_last_page_is_exact(self, mock_query_estimate, mock_estimate):
+        response = client.get(reverse(self.url_list), {"limit": 2, "offset": 4})
+        self.assertEqual(response.data["count"], 5)
+        self.assertTrue(response.data["count_is_exact"])
+        self.assertIsNone(response.data["next"])
+
+    @patch.object(JobLimitOffsetPagination, "count_estimate_threshold", 2)
+    @patch("tektank.libs.pagination.table_estimate", return_value=1000)
+    @patch("tektank.libs.pagination.queryset_estimate", return_value=1000)
+    def test_offset_past_the_end(self, mock_query_estimate, mock_estimate):
+        response = client.get(reverse(self.url_list), {"limit": 2, "offset": 50})
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["count"], 1000)
+        self.assertFalse(response.data["count_is_exact"])
+
+
+class ActiveJobExportTest(TestCase):
+    """ Test module for the streaming export of ActiveJobs """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.cheap = JobFactory(amount_to_pay=10)
+        cls.expensive = JobFactory(amount_to_pay=90)
+        cls.url_export = "v1:posts-activejob-export"
+
+    def _content(self, response):
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_ndjson(self):
+        response = client.get(reverse(self.url_export))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = self._content(response).splitlines()
+        ids = {json.loads(line)["id"] for line in lines}
+        self.assertEqual(ids, {str(self.cheap.id), str(self.expensive.id)})
+
+    def test_csv_honors_filters(self):
+        response = client.get(
+            reverse(self.url_export), {"export_format": "csv", "min_payment": 50},
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = self._content(response).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("id", lines[0].split(","))
+        self.assertIn(str(self.expensive.id), lines[1])
+
+    def test_invalid_format(self):
+        response = client.get(reverse(self.url_export), {"export_format": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NearFilterTest(TestCase):
+    """ Test module for the distance search of ActiveJobs """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.url_list = "v1:posts-activejob-list"
+        # Madrid centre, Getafe (~13 km), Toledo (~68 km), and no location.
+        cls.centre = JobFactory()
+        cls.getafe = JobFactory()
+        cls.toledo = JobFactory()
+        cls.nowhere = JobFactory()
+        for job, lat, lon in (
+                (cls.centre, 40.4168, -3.7038),
+                (cls.getafe, 40.3083, -3.7327),
+                (cls.toledo, 39.8628, -4.0273)):
+            Job.objects.filter(pk=job.pk).update(latitude=lat, longitude=lon)
+
+    def _ids(self, response):
+        return [item["id"] for item in response.data["results"]]
+
+    def test_within_radius_nearest_first(self):
+        response = client.get(
+            reverse(self.url_list), {"near": "40.4000,-3.7100", "radius": 30},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(response), [str(self.centre.id), str(self.getafe.id)])
+
+    def test_bigger_radius(self):
+        response = client.get(
+            reverse(self.url_list), {"near": "40.4168,-3.7038", "radius": 100},
+        )
+        self.assertEqual(
+            self._ids(response),
+            [str(self.centre.id), str(self.getafe.id), str(self.toledo.id)],
+        )
+
+    def test_invalid_point(self):
+        response = client.get(reverse(self.url_list), {"near": "north"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get(reverse(self.url_list), {"near": "95,0"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FacetsTest(TestCase):
+    """ Test module for the facet counts of ActiveJobs """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        design = PostArea.objects.create(name="Design")
+        web = PostArea.objects.create(name="Web Design", parent=design)
+        games = PostArea.objects.create(name="Games")
+        JobFactory(post_category=design, post_subcategory=web, amount_to_pay=80)
+        JobFactory(post_category=design, amount_to_pay=20)
+        JobFactory(post_category=games, amount_to_pay=90)
+        # Not active, not counted
+        JobFactory(post_category=games, deleted=True)
+        cls.url_facets = "v1:posts-activejob-facets"
+
+    def setUp(self):
+        post_areas.reload()
+
+    def _counts(self, response, facet):
+        return {item["value"]: item["count"] for item in response.data[facet]}
+
+    def test_all_facets(self):
+        with self.assertNumQueries(1):
+            response = client.get(reverse(self.url_facets))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._counts(response, "post_category"), {"Design": 2, "Games": 1})
+        self.assertEqual(self._counts(response, "post_subcategory"), {"Web Design": 1})
+        self.assertEqual(
+            self._counts(response, "payment"), {"great_payed": 2, "no_great_payed": 1},
+        )
+        self.assertEqual(
+            self._counts(response, "payment")["great_payed"],
+            ActiveJob.objects.great_payed().count(),
+        )
+
+    def test_facets_follow_filters(self):
+        response = client.get(reverse(self.url_facets), {"post_category": "design"})
+        self.assertEqual(self._counts(response, "post_category"), {"Design": 2})
+        self.assertEqual(
+            self._counts(response, "payment"), {"great_payed": 1, "no_great_payed": 1},
+        )
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 import json
 from datetime import timedelta
+from unittest import mock
 
 import factory
 from django.core.exceptions import ValidationError
 from django.test import Client, TestCase
 from django.urls import reverse
+from django.db import OperationalError
 from django.utils import timezone
 
 # To create fake data
@@ -16,7 +18,11 @@ from rest_framework.test import (
 )  # Inherit from this and self.client will be APIClient()
 
 from posts.api_v1.serializers import ActiveJobSerializer, JobSerializer
+from posts.api_v1.views import ActiveJobViewSet
+from posts.internal_services.cache import jobs_cache
+from posts.internal_services.services import CreateJobService
 from posts.models import ActiveJob, Job
+from tektank.libs.db_routers import STICKY_COOKIE
 from tektank.libs_project.helpers import slug_generator
 
 faker = Factory.create()
@@ -99,3 +105,184 @@ class PostJobTest(APITestCase):
         data_invalid2 = factory.build(dict, FACTORY_CLASS=JobFactoryInvalid2)
         response = self.client.post(self.url, data_invalid2)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_post_unknown_related_id(self):
+        data = dict(self.data_valid, city=999999)
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("city", str(response.data))
+
+
+class PostJobBatchTest(APITestCase):
+    """ Test module for POST of many jobs at once to Jobs API """
+
+    def setUp(self):
+        self.url = reverse("v1:posts-job-batch")
+        self.data_valid = [
+            factory.build(dict, FACTORY_CLASS=JobFactory) for _ in range(3)
+        ]
+        for data in self.data_valid:
+            data.pop("id", None)
+
+    def test_post_valid_batch(self):
+        response = self.client.post(self.url, self.data_valid, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Job.objects.count(), 3)
+        self.assertFalse(Job.objects.filter(slug__isnull=True).exists())
+
+    def test_post_invalid_batch(self):
+        data_invalid = factory.build(dict, FACTORY_CLASS=JobFactoryInvalid)
+        data_invalid.pop("id", None)
+        response = self.client.post(
+            self.url, self.data_valid + [data_invalid], format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_post_not_a_list(self):
+        response = self.client.post(self.url, self.data_valid[0], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PatchJobBulkTest(APITestCase):
+    """ Test module for PATCH of many jobs at once to Jobs API """
+
+    def setUp(self):
+        self.url = reverse("v1:posts-job-bulk-update")
+        data = [factory.build(dict, FACTORY_CLASS=JobFactory) for _ in range(3)]
+        for item in data:
+            item.pop("id", None)
+        _, ret = CreateJobService().create_jobs(data)
+        self.jobs = ret.get("data")
+
+    def test_patch_valid_bulk(self):
+        response = self.client.patch(
+            self.url,
+            [{"slug": job.slug, "amount_to_pay": 70} for job in self.jobs],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for job in Job.objects.all():
+            self.assertEqual(job.amount_to_pay, 70)
+
+    def test_patch_invalid_dates(self):
+        job = self.jobs[0]
+        response = self.client.patch(
+            self.url,
+            [
+                {"slug": self.jobs[1].slug, "amount_to_pay": 70},
+                {"slug": job.slug, "date_end": job.date_start - timedelta(hours=1)},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], "")
+        self.assertNotEqual(response.data[1], "")
+        # All or nothing
+        self.assertEqual(Job.objects.get(pk=self.jobs[1].pk).amount_to_pay,
+                         self.jobs[1].amount_to_pay)
+
+    def test_patch_unknown_slug(self):
+        response = self.client.patch(
+            self.url, [{"slug": "does-not-exist", "amount_to_pay": 70}], format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkSoftDeleteTest(APITestCase):
+    """ Test module for the bulk soft delete and restore of Jobs """
+
+    def setUp(self):
+        data = [factory.build(dict, FACTORY_CLASS=JobFactory) for _ in range(3)]
+        for item in data:
+            item.pop("id", None)
+        _, ret = CreateJobService().create_jobs(data)
+        self.jobs = ret.get("data")
+        self.slugs = [job.slug for job in self.jobs[:2]]
+
+    def test_delete_and_restore(self):
+        response = self.client.post(
+            reverse("v1:posts-job-bulk-delete"), {"slugs": self.slugs}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(Job.objects.filter(deleted=True).count(), 2)
+        self.assertEqual(ActiveJob.objects.count(), 1)
+        # Deleted jobs leave the search index
+        self.assertFalse(
+            Job.objects.filter(deleted=True, search_vector__isnull=False).exists()
+        )
+
+        response = self.client.post(
+            reverse("v1:posts-job-bulk-restore"), {"slugs": self.slugs}, format="json",
+        )
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(ActiveJob.objects.count(), 3)
+        self.assertFalse(Job.objects.filter(search_vector__isnull=True).exists())
+
+    def test_delete_invalid_body(self):
+        response = self.client.post(
+            reverse("v1:posts-job-bulk-delete"), {"slugs": "nope"}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReplicaRoutingTest(APITestCase):
+    """ Test module for reading from replicas, and from the primary after writes """
+
+    def setUp(self):
+        self.data = factory.build(dict, FACTORY_CLASS=JobFactory)
+
+    @mock.patch("tektank.libs.views.replicas.choose", return_value="default")
+    def test_reads_use_replicas(self, choose):
+        response = self.client.get(reverse("v1:posts-job-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        choose.assert_called_once_with()
+
+    @mock.patch("tektank.libs.views.replicas.choose", return_value="default")
+    def test_reads_after_write_use_primary(self, choose):
+        response = self.client.post(reverse("v1:posts-job-list"), self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        response = self.client.get(reverse("v1:posts-job-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        choose.assert_not_called()
+
+    def test_failed_write_not_pinned(self):
+        data_invalid = factory.build(dict, FACTORY_CLASS=JobFactoryInvalid)
+        response = self.client.post(reverse("v1:posts-job-list"), data_invalid)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    @mock.patch.object(jobs_cache, "timeout", 60)
+    def test_replica_reads_are_not_cached(self):
+        url = reverse("v1:posts-activejob-list")
+        jobs_cache.bump()
+        hits = jobs_cache.stats()["hits"]
+        with mock.patch("tektank.libs.views.replicas.choose", return_value="default"):
+            self.client.get(url)
+            self.client.get(url)
+        self.assertEqual(jobs_cache.stats()["hits"], hits)
+        # Read from the primary (no healthy replica): cached.
+        with mock.patch("tektank.libs.views.replicas.choose", return_value=None):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
+    @mock.patch("tektank.libs.views.replicas.mark_unhealthy")
+    @mock.patch("tektank.libs.views.replicas.choose", return_value="default")
+    def test_failed_replica_falls_back_to_primary(self, choose, mark_unhealthy):
+        filter_queryset = ActiveJobViewSet.filter_queryset
+        failed = []
+
+        def flaky(view, queryset):
+            if not failed:
+                failed.append(queryset.db)
+                raise OperationalError("replica gone")
+            return filter_queryset(view, queryset)
+
+        with mock.patch.object(ActiveJobViewSet, "filter_queryset", flaky):
+            response = self.client.get(reverse("v1:posts-activejob-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mark_unhealthy.assert_called_once_with("default")
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Test of the ASGI application: async reads, and writes through WSGI."""
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.api_v1.async_views import routes
+from posts.api_v1.views import ActiveJobViewSet
+from posts.internal_services.cache import jobs_cache
+from posts.internal_services.services import CreateJobService
+from posts.models import Job
+from tektank.libs.asgi import ASGIHandler
+
+
+def call(application, method, path, body=b"", query_string=b"", headers=()):
+    """Run one request through the ASGI application, return (status, headers, body)."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": [(b"host", b"testserver")] + list(headers),
+        "server": ("testserver", 80),
+    }
+    asyncio.get_event_loop().run_until_complete(application(scope, receive, send))
+    start = sent[0]
+    content = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), content
+
+
+class ASGIHandlerTest(TransactionTestCase):
+    """ Test module for the job endpoints served by asgi.py
+
+        Async handlers use connections of other threads, so data must be
+        committed: TransactionTestCase.
+    """
+
+    def setUp(self):
+        self.application = ASGIHandler(get_wsgi_application(), routes=routes)
+        _, ret = CreateJobService().create_job(
+            title="async", email="async@example.com", date_start=timezone.now(),
+            date_end=timezone.now() + timedelta(hours=3), amount_to_pay=10,
+        )
+        self.job = ret.get("data")
+
+    def test_async_retrieve(self):
+        url = reverse("v1:posts-job-detail", kwargs={"slug": self.job.slug})
+        status, headers, content = call(self.application, "GET", url)
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(content.decode("utf-8"))["slug"], self.job.slug)
+        self.assertIn(b"etag", headers)
+
+    def test_async_retrieve_not_found(self):
+        url = reverse("v1:posts-activejob-detail", kwargs={"slug": "missing"})
+        status, _, _ = call(self.application, "GET", url)
+        self.assertEqual(status, 404)
+
+    def test_async_list(self):
+        status, _, content = call(
+            self.application, "GET", reverse("v1:posts-activejob-list"),
+            query_string=b"title=async",
+        )
+        self.assertEqual(status, 200)
+        results = json.loads(content.decode("utf-8"))["results"]
+        self.assertEqual([job["id"] for job in results], [str(self.job.id)])
+
+    def test_export_is_streamed(self):
+        status, headers, content = call(
+            self.application, "GET", reverse("v1:posts-activejob-export"),
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"content-type"], b"application/x-ndjson")
+        lines = content.decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], [str(self.job.id)])
+
+    @mock.patch.object(jobs_cache, "timeout", 60)
+    def test_replica_reads_are_not_cached(self):
+        url = reverse("v1:posts-activejob-list")
+        jobs_cache.bump()
+        hits = jobs_cache.stats()["hits"]
+        with mock.patch("tektank.libs.views.replicas.choose", return_value="default"):
+            call(self.application, "GET", url)
+            call(self.application, "GET", url)
+        self.assertEqual(jobs_cache.stats()["hits"], hits)
+        # Read from the primary (no healthy replica): cached.
+        with mock.patch("tektank.libs.views.replicas.choose", return_value=None):
+            call(self.application, "GET", url)
+            status, _, _ = call(self.application, "GET", url)
+        self.assertEqual(status, 200)
+        self.assertEqual(jobs_cache.stats()["hits"], hits + 1)
+
+    @mock.patch("tektank.libs.views.replicas.mark_unhealthy")
+    @mock.patch("tektank.libs.views.replicas.choose", return_value="default")
+    def test_failed_replica_falls_back_to_primary(self, choose, mark_unhealthy):
+        filter_queryset = ActiveJobViewSet.filter_queryset
+        failed = []
+
+        def flaky(view, queryset):
+            if not failed:
+                failed.append(queryset.db)
+                raise OperationalError("replica gone")
+            return filter_queryset(view, queryset)
+
+        with mock.patch.object(ActiveJobViewSet, "filter_queryset", flaky):
+            status, _, content = call(
+                self.application, "GET", reverse("v1:posts-activejob-list"),
+            )
+        self.assertEqual(status, 200)
+        mark_unhealthy.assert_called_once_with("default")
+        results = json.loads(content.decode("utf-8"))["results"]
+        self.assertEqual([job["id"] for job in results], [str(self.job.id)])
+
+    def test_write_goes_through_wsgi(self):
+        data = {
+            "title": "sync", "email": "sync@example.com",
+            "date_start": timezone.now().isoformat(),
+            "date_end": (timezone.now() + timedelta(hours=3)).isoformat(),
+            "amount_to_pay": 10,
+        }
+        status, _, _ = call(
+            self.application, "POST", reverse("v1:posts-job-list"),
+            body=json.dumps(data).encode("utf-8"),
+            headers=[(b"content-type", b"application/json")],
+        )
+        self.assertEqual(status, 201)
+        self.assertTrue(Job.objects.filter(title="sync").exists())
+
+
+class ASGIStreamingTest(SimpleTestCase):
+    """ Streamed responses are read out of the pool of the other requests """
+
+    def _thread_names(self):
+        for _ in range(3):
+            yield threading.current_thread().name + "\n"
+
+    def test_streaming_pool(self):
+        def application(environ, start_response):
+            response = StreamingHttpResponse(self._thread_names())
+            start_response("200 OK", list(response.items()))
+            return response
+
+        status, _, content = call(ASGIHandler(application), "GET", "/export/")
+        self.assertEqual(status, 200)
+        names = content.decode("utf-8").splitlines()
+        self.assertEqual(len(names), 3)
+        for name in names:
+            self.assertTrue(name.startswith("asgi-streaming"))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Test of the database connection pool."""
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from tektank.libs.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    return ConnectionPool(
+        FakeConnection, lambda conn: None, lambda conn: not conn.closed, **kwargs,
+    )
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """ Test module for ConnectionPool """
+
+    def test_reuses_connections(self):
+        pool = make_pool()
+        conn = pool.get()
+        pool.put(conn)
+        self.assertIs(pool.get(), conn)
+        stats = pool.stats()
+        self.assertEqual(stats["opened"], 1)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["saturation"], 0.1)
+
+    def test_waits_for_a_connection(self):
+        pool = make_pool(max_size=1, timeout=5)
+        conn = pool.get()
+        threading.Timer(0.05, pool.put, (conn,)).start()
+        self.assertIs(pool.get(), conn)
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_timeout(self):
+        pool = make_pool(max_size=1, timeout=0.01)
+        pool.get()
+        with self.assertRaises(PoolTimeout):
+            pool.get()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_reaps_idle_connections(self):
+        pool = make_pool(min_size=1, max_idle=0.01)
+        conns = [pool.get(), pool.get()]
+        for conn in conns:
+            pool.put(conn)
+        time.sleep(0.02)
+        pool.get()
+        self.assertEqual(pool.stats()["size"], 1)
+        self.assertTrue(conns[0].closed)
+
+    def test_discards_broken_connections(self):
+        pool = make_pool(check_idle=0)
+        conn = pool.get()
+        pool.put(conn)
+        conn.closed = True
+        self.assertIsNot(pool.get(), conn)
+        self.assertEqual(pool.stats()["failed_checks"], 1)
@@ -3,14 +3,16 @@
 from datetime import timedelta
 
 import factory
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 
 # To create fake data
 from faker import Factory
 
 from posts.models import Job
-from posts.internal_services.services import CreateJobService
+from posts.internal_services.categories import post_areas
+from posts.internal_services.services import CreateJobService, UpdateJobService
+from posts_areas.models import PostArea
 
 faker = Factory.create()
 
@@ -109,3 +111,117 @@ class JobCreationServiceTest(TestCase):
         # No amount_to_pay
         e, j = JobFactory(amount_to_pay=None)
         assert e is not ''
+
+
+class JobBatchCreationServiceTest(TestCase):
+    """ Test creation of many jobs at once, through services """
+
+    def setUp(self, **kwargs):
+        self.start = timezone.now()
+        self.end = timezone.now() + timedelta(hours=3)
+
+    def _job(self, **kwargs):
+        data = dict(
+            title=faker.word(), email=faker.email(), date_start=self.start,
+            date_end=self.end, amount_to_pay=10,
+        )
+        data.update(kwargs)
+        return data
+
+    def test_batch_creation(self):
+        errors, data = CreateJobService().create_jobs(
+            [self._job(title="first"), self._job(title="second")],
+        )
+        self.assertEqual(errors, [])
+        jobs = data.get('data')
+        self.assertEqual([j.title for j in jobs], ["first", "second"])
+        self.assertEqual(Job.objects.count(), 2)
+        for job in Job.objects.all():
+            self.assertTrue(job.slug)
+            self.assertIsNotNone(job.payment_comission)
+
+    def test_category_by_name_or_id(self):
+        area = PostArea.objects.create(name="Batch category")
+        post_areas.reload()
+        errors, data = CreateJobService().create_jobs([
+            self._job(post_category="Batch category"),
+            self._job(post_category=area.pk),
+        ])
+        self.assertEqual(errors, [])
+        self.assertEqual([job.post_category_id for job in data['data']], [area.pk, area.pk])
+
+    def test_unknown_category(self):
+        errors, data = CreateJobService().create_jobs([
+            self._job(),
+            self._job(post_category="No such category"),
+        ])
+        self.assertEqual(errors[0], '')
+        self.assertIn('post_category', errors[1])
+        self.assertEqual(data, {})
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_errors_per_item(self):
+        errors, data = CreateJobService().create_jobs([
+            self._job(),
+            self._job(date_end=self.start - timedelta(hours=1)),
+            self._job(email=None),
+        ])
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(errors[0], '')
+        self.assertNotEqual(errors[1], '')
+        self.assertNotEqual(errors[2], '')
+        self.assertEqual(data, {})
+        # All or nothing
+        self.assertEqual(Job.objects.count(), 0)
+
+
+class JobBatchUpdateServiceTest(TestCase):
+    """ Test update of many jobs at once, through services """
+
+    def test_cleaned_values_are_written(self):
+        _, data = JobFactory(title="Old title")
+        job = data['data']
+        errors, _ = UpdateJobService().update_jobs([(job, {'title': "  New title  "})])
+        self.assertEqual(errors, [])
+        self.assertEqual(job.title, "New title")
+        self.assertEqual(Job.objects.get(pk=job.pk).title, "New title")
+
+
+class JobCreationIntegrityMixin:
+    """ A related row deleted before the insert is an error, not an exception """
+
+    def setUp(self):
+        area = PostArea.objects.create(name="Gone")
+        # Loaded from the database, so it is trusted and not queried again.
+        self.gone = PostArea.objects.get(pk=area.pk)
+        area.delete()
+
+    def _job(self, **kwargs):
+        data = dict(
+            title=faker.word(), email=faker.email(), date_start=timezone.now(),
+            date_end=timezone.now() + timedelta(hours=3), amount_to_pay=10,
+            post_category=self.gone,
+        )
+        data.update(kwargs)
+        return data
+
+    def test_create_job(self):
+        errors, ret = CreateJobService().create_job(**self._job())
+        self.assertNotEqual(errors, '')
+        self.assertEqual(ret, {})
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_create_jobs(self):
+        errors, ret = CreateJobService().create_jobs([self._job(), self._job()])
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all(errors))
+        self.assertEqual(ret, {})
+        self.assertEqual(Job.objects.count(), 0)
+
+
+class JobCreationIntegrityTest(JobCreationIntegrityMixin, TransactionTestCase):
+    """ Without an outer transaction, constraints are checked at our commit """
+
+
+class JobCreationNestedIntegrityTest(JobCreationIntegrityMixin, TestCase):
+    """ Inside an outer transaction (the one of TestCase), they are checked too """
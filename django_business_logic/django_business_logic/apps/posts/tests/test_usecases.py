@@ -6,8 +6,12 @@ from unittest.mock import patch
 
 import factory
 import pytest
+from django.conf import settings
+from django.contrib.gis.geos import Point
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django_mock_queries.query import MockSet
 
@@ -17,8 +21,15 @@ from faker import Factory
 import tektank.libs_project.shortuuid as _su
 from posts.models import Job
 from posts.internal_services.adapters import JobRepository
+from posts.internal_services.categories import post_areas
+from posts.internal_services.commands import JobCommand
+from posts.internal_services.comissions import PaymentComissionBrackets
 from posts.internal_services.errors import InvalidCategories, InvalidDateOrder
+from posts.internal_services.locations import locate
 from posts.internal_services.usecases import CreateJob
+from tektank.libs.validation import foreign_key_errors, resolve_foreign_keys
+from cities.models import City, PostalCode
+from payments_comissions.models import PaymentComission
 from posts_areas.models import PostArea
 
 faker = Factory.create()
@@ -209,7 +220,7 @@ class TestExecute(TestCase):
 # ------------------------------------------------------------------------------
 
 # Replace this searches so we do not hit database:
-# cat = PostArea.objects.find_by_name(self._post_category) if self._post_category else None
+# cat = post_areas.by_name(self._post_category) if self._post_category else None
 def findbn(category):
     pa1 = PostArea(name='one')
     pa11 = PostArea(name='one-child', parent=pa1)
@@ -224,7 +235,7 @@ def findbn(category):
 
 #mocker.patch.object(PostArea.objects, 'find_by_name', side_effect=findbn)
 @pytest.mark.django_db
-@patch.object(PostArea.objects, 'find_by_name', side_effect=findbn)
+@patch.object(post_areas, 'by_name', side_effect=findbn)
 class TestValidData:
     """ Test the is_valid method on RegisterUserAccount use case """
 
@@ -263,6 +274,22 @@ class TestValidData:
             # but it does not need it in this case
             use_case.is_valid()
 
+    def test_when_category_is_unknown(self, mock_find):
+        """An unknown category name is an error, it is not left empty"""
+
+        with pytest.raises(ValidationError) as excinfo:
+            use_case = CreateJob(
+                JobRepository(),
+                title='How to test a job creation',
+                email='john.smith@example.com',
+                date_start=timezone.now(),
+                date_end=timezone.now() + timedelta(hours=1),
+                amount_to_pay=20,
+                post_subcategory='unknown',
+            )
+            use_case.is_valid()
+        assert list(excinfo.value.message_dict) == ['post_subcategory']
+
     @pytest.mark.django_db
     def test_when_title_is_too_long(self, mock_find):
 
@@ -289,3 +316,214 @@ class TestValidData:
             )
 
             use_case.is_valid()
+
+
+# ------------------------------------------------------------------------------
+# |                       Test PostArea registry                               |
+# ------------------------------------------------------------------------------
+
+class PostAreaRegistryTest(TestCase):
+    """ Test that categories are resolved from memory """
+
+    @classmethod
+    def setUpTestData(cls):  # noqa: N802
+        cls.design = PostArea.objects.create(name="Design")
+        cls.web = PostArea.objects.create(name="Web Design", parent=cls.design)
+
+    def setUp(self):
+        post_areas.reload()
+
+    def test_resolves_without_queries(self):
+        with self.assertNumQueries(0):
+            web = post_areas.by_name("Web Design")
+            self.assertEqual(web.parent.name, "Design")
+            self.assertEqual(post_areas.get(self.design.pk), self.design)
+            self.assertIsNone(post_areas.by_name("Nope"))
+
+
+class PostAreaRegistryInvalidationTest(TransactionTestCase):
+    """ Test that saving or deleting a PostArea refreshes the registry """
+
+    def test_invalidated_on_save_and_delete(self):
+        post_areas.reload()
+        games = PostArea.objects.create(name="Games")
+        self.assertEqual(post_areas.by_name("Games"), games)
+        games.delete()
+        self.assertIsNone(post_areas.by_name("Games"))
+
+
+# ------------------------------------------------------------------------------
+# |                       Test PaymentComission brackets                       |
+# ------------------------------------------------------------------------------
+
+class PaymentComissionBracketsTest(TestCase):
+    """ Test the binary search over the comission brackets """
+
+    def setUp(self):
+        self.low = PaymentComission(percentage=10)
+        self.high = PaymentComission(percentage=20)
+        patcher = patch.object(
+            PaymentComissionBrackets, '_data', return_value=([0, 50], [self.low, self.high]),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.brackets = PaymentComissionBrackets()
+
+    def test_assign(self):
+        with self.assertNumQueries(0):
+            self.assertIs(self.brackets.assign(20), self.low)
+            self.assertIs(self.brackets.assign(50), self.high)
+            self.assertIs(self.brackets.assign(60), self.high)
+
+    def test_assign_many(self):
+        self.assertEqual(
+            self.brackets.assign_many([60, 0, None, 60]),
+            [self.high, self.low, None, self.high],
+        )
+
+
+class PaymentComissionBracketsDatabaseTest(TestCase):
+    """ The brackets read from the table assign as the model does """
+
+    def setUp(self):
+        self.bound_field = settings.PAYMENT_COMISSION_BOUND_FIELD
+        for bound, percentage in ((0, 10), (50, 20), (100, 30)):
+            PaymentComission.objects.create(
+                **{self.bound_field: bound, 'percentage': percentage}
+            )
+        self.brackets = PaymentComissionBrackets(bound_field=self.bound_field)
+
+    def test_same_as_model(self):
+        self.brackets.reload()
+        for amount in (0, 1, 49, 50, 51, 99, 100, 101, 1000):
+            self.assertEqual(
+                self.brackets.assign(amount),
+                PaymentComission.assign_payment_comission(amount),
+                amount,
+            )
+
+    def test_table_is_used(self):
+        bounds, _ = self.brackets.reload()
+        self.assertEqual(bounds, [0, 50, 100])
+
+    def test_mismatch_falls_back_to_model(self):
+        other = PaymentComission.objects.order_by('-' + self.bound_field).first()
+        with patch.object(PaymentComission, 'assign_payment_comission', return_value=other):
+            bounds, _ = self.brackets.reload()
+            self.assertEqual(bounds, [])
+            self.assertEqual(self.brackets.assign(0), other)
+
+
+# ------------------------------------------------------------------------------
+# |                       Test batched foreign key checks                      |
+# ------------------------------------------------------------------------------
+
+class ForeignKeyValidationTest(TestCase):
+    """ Test that foreign keys of many jobs are checked with one query per table """
+
+    def test_one_query_per_table(self):
+        design = PostArea.objects.create(name="Design")
+        gone = PostArea.objects.create(name="Gone")
+        gone_pk = gone.pk
+        gone.delete()
+        jobs = [
+            Job(post_category_id=design.pk, post_subcategory_id=design.pk),
+            Job(post_category_id=gone_pk),
+            Job(post_category=design),
+        ]
+        with self.assertNumQueries(1):
+            errors = foreign_key_errors(jobs)
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ["post_category"])
+        self.assertEqual(errors[2], {})
+
+    def test_resolve_ids_of_any_type(self):
+        design = PostArea.objects.create(name="Design")
+        rows = [
+            {"post_category": str(design.pk)},
+            {"post_category": design.pk},
+            {"post_category": "design"},
+            {"post_category": [design.pk]},
+        ]
+        with self.assertNumQueries(1):
+            errors = resolve_foreign_keys(Job, rows)
+        self.assertEqual(errors[:2], [{}, {}])
+        self.assertEqual([row["post_category"] for row in rows[:2]], [design, design])
+        self.assertEqual(list(errors[2]), ["post_category"])
+        self.assertEqual(list(errors[3]), ["post_category"])
+
+
+# ------------------------------------------------------------------------------
+# |                       Test coordinates of jobs                             |
+# ------------------------------------------------------------------------------
+
+class LocateTest(TestCase):
+    """ Test that places already set on a job are not loaded again """
+
+    def _job(self, **kwargs):
+        return Job(
+            title=faker.word(), email=faker.email(), date_start=timezone.now(),
+            date_end=timezone.now() + timedelta(hours=3), amount_to_pay=10, **kwargs
+        )
+
+    def _place(self, model, pk, x, y):
+        place = model(pk=pk, location=Point(x, y))
+        place._state.adding = False
+        return place
+
+    def test_create_with_places_set(self):
+        repository = JobRepository()
+        with CaptureQueriesContext(connection) as plain:
+            repository.save(self._job())
+        job = self._job(
+            city=self._place(City, 1, 2.17, 41.38),
+            postal_code=self._place(PostalCode, 1, 2.16, 41.39),
+        )
+        with self.assertNumQueries(len(plain)):
+            repository.save(job)
+        self.assertEqual((job.latitude, job.longitude), (41.39, 2.16))
+
+    def test_ids_are_loaded(self):
+        job = self._job(city=self._place(City, 1, 2.17, 41.38))
+        # Setting the id does not clear the cached city, which is now stale.
+        job.city_id = 2
+        with self.assertNumQueries(1):
+            locate([job])
+        self.assertIsNone(job.latitude)
+
+
+# ------------------------------------------------------------------------------
+# |                       Test JobCommand                                      |
+# ------------------------------------------------------------------------------
+
+class JobCommandTest(TestCase):
+    """ Test the command CreateJob is built from """
+
+    def setUp(self):
+        self.command = JobCommand(
+            ' How to test a job creation ',
+            'john.smith@example.com ',
+            timezone.now(),
+            timezone.now() + timedelta(hours=1),
+            20,
+            address=' 123 street',
+        )
+
+    def test_strip_and_kwargs(self):
+        self.command.strip()
+        kwargs = self.command.job_kwargs()
+        self.assertEqual(kwargs['title'], 'How to test a job creation')
+        self.assertEqual(kwargs['email'], 'john.smith@example.com')
+        self.assertEqual(kwargs['address'], '123 street')
+        self.assertNotIn('city', kwargs)
+
+    def test_has_no_dict(self):
+        with self.assertRaises(AttributeError):
+            self.command.website = 'http://example.com'
+
+    @patch.object(CreateJob, 'is_valid', return_value=True)
+    def test_create_job_from_command(self, mock_is_valid):
+        job = CreateJob.from_command(JobRepository(), self.command).prepare()
+        assert isinstance(job, Job)
+        assert job.title == 'How to test a job creation'
+        assert job.slug
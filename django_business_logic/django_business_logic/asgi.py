@@ -0,0 +1,25 @@
+"""
+ASGI config for project_name project.
+
+It exposes a module-level variable named ``application``, for any ASGI server
+(``uvicorn django_business_logic.asgi:application``). Reads of the job
+endpoints are served by async handlers (see posts.api_v1.async_views), the
+rest goes to the same application as wsgi.py, run in a pool of threads (see
+tektank.libs.asgi).
+
+"""
+import os
+from os.path import abspath, dirname
+from sys import path
+
+SITE_ROOT = dirname(dirname(abspath(__file__)))
+path.append(SITE_ROOT)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_name.settings.production")
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+wsgi_application = get_wsgi_application()
+
+from posts.api_v1.async_views import routes  # noqa: E402
+from tektank.libs.asgi import ASGIHandler  # noqa: E402
+application = ASGIHandler(wsgi_application, routes=routes)
@@ -0,0 +1,279 @@
+"""ASGI application for a Django version that only speaks WSGI.
+
+Reading the request body and writing the response happen in the event loop,
+so a slow client holds a coroutine, not a thread. Django itself (middleware,
+views, the ORM) still runs synchronously, in a bounded pool of threads:
+
+* Routes with an async handler (see `AsyncReadHandler`) are served by it; it
+  only uses the threads for database work.
+* Everything else is handed to the WSGI application in a thread, unchanged.
+  Its response is sent as the thread produces it, with backpressure.
+  Streamed responses (exports) are read in a pool of their own, so long
+  downloads never take the threads the other requests need.
+
+Serve it with any ASGI 3 server, for example ``uvicorn project.asgi:application``.
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+
+# Chunks of a response waiting to be sent, before the thread producing it waits.
+RESPONSE_BUFFER_CHUNKS = 8
+
+_thread_pool = None
+_streaming_pool = None
+
+
+def thread_pool():
+    """Return the pool of threads where synchronous Django code runs."""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASGI_THREADS', 10), thread_name_prefix='asgi',
+        )
+    return _thread_pool
+
+
+def streaming_pool():
+    """Return the pool of threads where the body of streamed responses is read."""
+    global _streaming_pool
+    if _streaming_pool is None:
+        _streaming_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASGI_STREAMING_THREADS', 10),
+            thread_name_prefix='asgi-streaming',
+        )
+    return _streaming_pool
+
+
+def _call_with_connection(func, args, kwargs):
+    # What Django does around each request, so broken or expired database
+    # connections of the thread are not reused.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """Run a blocking call (ORM, cache) in the thread pool, and wait for it."""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        thread_pool(), partial(_call_with_connection, func, args, kwargs),
+    )
+
+
+def scope_to_environ(scope, body):
+    """Return the WSGI environ of an ASGI http scope with its whole body."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        host, port = scope['client'][:2]
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = host, str(port)
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        environ[key] = '{},{}'.format(environ[key], value) if key in environ else value
+    return environ
+
+
+class ASGIHandler:
+    """ASGI 3 application: async handlers for some routes, WSGI for the rest.
+
+    ``ASGIHandler(wsgi_application, routes=None)``
+
+    ``routes`` maps url names (``'v1:posts-job-list'``) to coroutines called
+    with the request and the url kwargs. They return an HttpResponse, or None
+    to let the WSGI application answer instead.
+
+    Async handlers run without Django middleware, so they are only used for
+    anonymous reads: GETs without cookies, credentials nor CORS headers.
+    """
+
+    # Requests with any of these need the middleware (sessions, auth, CORS).
+    middleware_headers = ('HTTP_COOKIE', 'HTTP_AUTHORIZATION', 'HTTP_ORIGIN')
+
+    def __init__(self, wsgi_application, routes=None):
+        self.wsgi_application = wsgi_application
+        self.routes = routes or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type: {}'.format(scope['type']))
+        body = await self.read_body(receive)
+        response = await self.call_route(scope, body)
+        if response is not None:
+            await self.send_response(response, send)
+        else:
+            await self.call_wsgi(scope_to_environ(scope, body), send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            body.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(body)
+
+    async def call_route(self, scope, body):
+        """Return the response of the async handler of the route, if any."""
+        if not self.routes or scope['method'] != 'GET':
+            return None
+        environ = scope_to_environ(scope, body)
+        if any(header in environ for header in self.middleware_headers):
+            return None
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            return None
+        handler = self.routes.get(match.view_name)
+        if handler is None:
+            return None
+        return await handler(WSGIRequest(environ), **match.kwargs)
+
+    async def send_response(self, response, send):
+        headers = [
+            (name.encode('latin-1'), value.encode('latin-1'))
+            for name, value in response.items()
+        ]
+        for cookie in response.cookies.values():
+            headers.append((b'set-cookie', cookie.output(header='').strip().encode('latin-1')))
+        await send({
+            'type': 'http.response.start', 'status': response.status_code, 'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': response.content})
+
+    async def call_wsgi(self, environ, send):
+        """Run the WSGI application in a thread, sending its output as it comes.
+
+        A streamed response is read in a thread of `streaming_pool`, so it
+        only holds a thread of `thread_pool` until the view returns. Its
+        generator must not touch the database before the first chunk is
+        asked for (``iterator()`` does not), so the whole stream uses the
+        connection of the streaming thread.
+        """
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(maxsize=RESPONSE_BUFFER_CHUNKS)
+        future = asyncio.ensure_future(self._produce(environ, loop, queue))
+        connected = True
+        while True:
+            kind, data = await queue.get()
+            if kind == 'end':
+                break
+            if not connected:
+                # Client gone: keep draining so the thread can finish.
+                continue
+            try:
+                if kind == 'start':
+                    status, headers = data
+                    await send({
+                        'type': 'http.response.start',
+                        'status': int(status.split(' ', 1)[0]),
+                        'headers': [
+                            (k.encode('latin-1'), v.encode('latin-1')) for k, v in headers
+                        ],
+                    })
+                else:
+                    await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            except OSError:
+                connected = False
+        await future
+        if connected:
+            await send({'type': 'http.response.body', 'body': b''})
+
+    async def _produce(self, environ, loop, queue):
+        result = await loop.run_in_executor(
+            thread_pool(), self._run_wsgi, environ, loop, queue,
+        )
+        if result is not None:
+            await loop.run_in_executor(
+                streaming_pool(), self._send_body, result, _putter(loop, queue),
+            )
+
+    def _run_wsgi(self, environ, loop, queue):
+        """Call the application, and send its body unless it is streamed.
+
+        Returns:
+            The streamed body still to be sent, or None.
+
+        """
+        put = _putter(loop, queue)
+
+        def start_response(status, headers, exc_info=None):
+            put(('start', (status, headers)))
+            return lambda data: put(('body', data))
+
+        try:
+            result = self.wsgi_application(environ, start_response)
+        except BaseException:
+            put(('end', None))
+            raise
+        if getattr(result, 'streaming', False):
+            # The stream has its own connection, in the streaming thread.
+            close_old_connections()
+            return result
+        self._send_body(result, put)
+        return None
+
+    @staticmethod
+    def _send_body(result, put):
+        try:
+            try:
+                for chunk in result:
+                    if chunk:
+                        put(('body', chunk))
+            finally:
+                # Sends request_finished, which closes the connections of this thread.
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            put(('end', None))
+
+
+def _putter(loop, queue):
+    """Return a function that puts items in queue from another thread, waiting for room."""
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+    return put
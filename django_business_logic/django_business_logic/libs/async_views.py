@@ -0,0 +1,148 @@
+"""Async list and retrieve for the viewsets, served by `tektank.libs.asgi`.
+
+The viewset still defines everything: queryset, filters, serializer,
+pagination, permissions. Only the steps that touch the database are awaited,
+through an async repository, so the event loop keeps serving other clients
+meanwhile. Whatever these handlers do not cover returns None, and the request
+is answered by the regular (sync) viewset.
+"""
+from calendar import timegm
+
+from django.db import InterfaceError, OperationalError
+from django.http import Http404
+from django.utils.http import http_date
+from rest_framework import exceptions
+from rest_framework.response import Response
+
+from tektank.libs.asgi import run_in_thread
+from tektank.libs.values import plan_columns, serialize_values
+from tektank.libs.views import may_cache_reads
+
+
+class AsyncReadHandler:
+    """Async ``list`` and ``retrieve`` of a DRF viewset.
+
+    ``AsyncReadHandler(viewset_class, repository)``
+
+    ``repository`` must have the coroutines ``get(queryset, **lookup)``,
+    ``fetch(queryset)`` and ``paginate(paginator, queryset, request, view)``.
+
+    Only JSON is rendered here, and conditional retrieves are left to the
+    viewset (`ConditionalRetrieveMixin`).
+    """
+
+    def __init__(self, viewset_class, repository):
+        self.viewset_class = viewset_class
+        self.repository = repository
+
+    async def list(self, request, **kwargs):
+        view = await self.make_view(request, 'list', kwargs)
+        if view is None:
+            return None
+        request = view.request
+        cache = getattr(view, 'list_cache', None)
+        key = None
+        if cache is not None:
+            key = await run_in_thread(cache.make_key, view.get_list_cache_params(request))
+            data = await run_in_thread(cache.get, key)
+            if data is not None:
+                return self.finalize(view, Response(data))
+
+        response = await self.read(view, self._list_response)
+        if key is not None and response.status_code == 200 and may_cache_reads(view):
+            await run_in_thread(cache.set, key, response.data)
+        return self.finalize(view, response)
+
+    async def retrieve(self, request, **kwargs):
+        view = await self.make_view(request, 'retrieve', kwargs)
+        if view is None:
+            return None
+        return self.finalize(view, await self.read(view, self._retrieve_response))
+
+    async def read(self, view, read_response):
+        """Return ``await read_response(view)``, on the primary if the replica fails.
+
+        As `ReplicaReadMixin.handle_exception` does for the sync requests.
+        """
+        try:
+            return await read_response(view)
+        except (OperationalError, InterfaceError) as exc:
+            fall_back_to_primary = getattr(view, 'fall_back_to_primary', None)
+            if fall_back_to_primary is None or not fall_back_to_primary(exc):
+                raise
+        return await read_response(view)
+
+    async def make_view(self, request, action, kwargs):
+        """Return the viewset instance ready to serve the request, or None.
+
+        Authentication, permissions and throttling run as in the viewset.
+        """
+        if (request.META.get('HTTP_IF_NONE_MATCH')
+                or request.META.get('HTTP_IF_MODIFIED_SINCE')):
+            return None
+        view = self.viewset_class(action_map={'get': action})
+        view.action = action
+        view.args, view.kwargs = (), kwargs
+        view.format_kwarg = None
+        view.request = view.initialize_request(request, **kwargs)
+        view.headers = view.default_response_headers
+        try:
+            await run_in_thread(view.initial, view.request, **kwargs)
+        except exceptions.APIException:
+            # Let the viewset answer the errors.
+            return None
+        if view.request.accepted_renderer.format != 'json':
+            return None
+        return view
+
+    async def _list_response(self, view):
+        request = view.request
+        try:
+            queryset, plan = await run_in_thread(self._list_queryset, view)
+            page = None
+            if view.paginator is not None:
+                page = await self.repository.paginate(view.paginator, queryset, request, view)
+        except exceptions.APIException as exc:
+            # Invalid filters or pagination parameters.
+            return view.handle_exception(exc)
+        rows = page if page is not None else await self.repository.fetch(queryset)
+        if plan is not None:
+            data = serialize_values(rows, plan, request)
+        else:
+            data = view.get_serializer(rows, many=True).data
+        return view.get_paginated_response(data) if page is not None else Response(data)
+
+    async def _retrieve_response(self, view):
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            queryset = await run_in_thread(lambda: view.filter_queryset(view.get_queryset()))
+            obj = await self.repository.get(
+                queryset, **{view.lookup_field: view.kwargs[lookup_url_kwarg]}
+            )
+            if obj is None:
+                raise Http404
+            view.check_object_permissions(view.request, obj)
+        except (exceptions.APIException, Http404) as exc:
+            return view.handle_exception(exc)
+        response = Response(view.get_serializer(obj).data)
+        version_field = getattr(view, 'version_field', None)
+        if version_field and version_field not in obj.get_deferred_fields():
+            modified = getattr(obj, version_field)
+            response['ETag'] = view.get_etag(view.request, obj.pk, modified)
+            if modified:
+                response['Last-Modified'] = http_date(timegm(modified.utctimetuple()))
+        return response
+
+    def finalize(self, view, response):
+        response = view.finalize_response(view.request, response)
+        return response.render()
+
+    def _list_queryset(self, view):
+        # Filters can read cached lookups that reload from the database.
+        queryset = view.filter_queryset(view.get_queryset())
+        plan = view.get_values_plan() if hasattr(view, 'get_values_plan') else None
+        if plan is not None:
+            queryset = queryset.values(
+                *plan_columns(plan, queryset.model, view.required_columns)
+            )
+        return queryset, plan
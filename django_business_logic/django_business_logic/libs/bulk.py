@@ -0,0 +1,60 @@
+"""Set based writes, for when one UPDATE per object is too many round trips."""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+def bulk_update(objs, fields, batch_size=BULK_UPDATE_BATCH_SIZE):
+    """Save the given fields of many objects with one UPDATE per batch.
+
+    ``bulk_update(objs, fields, batch_size=500) -> int``
+
+    Like ``QuerySet.bulk_update`` of newer Django versions: every column gets a
+    ``CASE WHEN pk = ... THEN ...`` with the value of each object. ``auto_now``
+    fields (``updated_at``) are set too, as ``save()`` would. As with any
+    ``update()``, ``save()`` is not called nor signals sent.
+
+    Args:
+        objs (list): Instances already saved, with the new values set.
+        fields (list): Names of the fields to write.
+        batch_size (int): Objects per UPDATE statement.
+
+    Returns:
+        int: Number of rows updated.
+
+    """
+    if not objs:
+        return 0
+    opts = objs[0]._meta
+    model_fields = [opts.get_field(name) for name in fields]
+    model_fields += [
+        field for field in opts.concrete_fields
+        if getattr(field, 'auto_now', False) and field not in model_fields
+    ]
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            for obj in batch:
+                for field in model_fields:
+                    if getattr(field, 'auto_now', False):
+                        field.pre_save(obj, add=False)
+            updates = {
+                field.attname: Case(
+                    *[
+                        When(pk=obj.pk, then=Value(
+                            getattr(obj, field.attname),
+                            output_field=field.target_field if field.is_relation else field,
+                        ))
+                        for obj in batch
+                    ],
+                    default=F(field.attname),
+                    output_field=field.target_field if field.is_relation else field,
+                )
+                for field in model_fields
+            }
+            updated += type(objs[0])._default_manager.filter(
+                pk__in=[obj.pk for obj in batch],
+            ).update(**updates)
+    return updated
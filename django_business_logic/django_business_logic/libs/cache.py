@@ -0,0 +1,163 @@
+"""Caching helpers to use in our apps."""
+import hashlib
+import json
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+class GenerationCache:
+    """Namespaced cache, invalidated all at once by bumping a generation counter.
+
+    ``class GenerationCache(namespace, timeout=60, alias='default')``
+
+    Every key is stored under the current generation of the namespace. Writers
+    call `bump` and, from then on, readers look for keys of the new generation,
+    so old entries are never read again and just expire.
+
+    Hits and misses are counted in the cache itself, so they are shared by all
+    the processes using the same cache backend.
+
+    Usage::
+
+        jobs_cache = GenerationCache('jobs')
+        key = jobs_cache.make_key(params)
+        data = jobs_cache.get(key)
+        if data is None:
+            data = compute()
+            jobs_cache.set(key, data)
+        ...
+        jobs_cache.bump_on_commit()  # after a write
+
+    The key is built before computing the value, so if a write happens in the
+    meantime the value is stored under the old generation and never served.
+    Writers inside a transaction must use `bump_on_commit`: bumping before
+    the commit lets a reader cache the old rows under the new generation.
+
+    The backend must be shared by all the processes (memcached, redis), with
+    a per-process one (locmem) a write only invalidates its own process.
+    """
+
+    def __init__(self, namespace, timeout=60, alias='default'):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, name):
+        return '{}:{}'.format(self.namespace, name)
+
+    def generation(self):
+        """Return the current generation of the namespace."""
+        key = self._key('generation')
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, self._new_generation(), timeout=None)
+            generation = self.cache.get(key)
+        return generation
+
+    def bump(self):
+        """Invalidate every entry of the namespace."""
+        key = self._key('generation')
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Not there yet (or evicted): start a generation never used before.
+            self.cache.add(key, self._new_generation(), timeout=None)
+
+    def bump_on_commit(self, using=None):
+        """Invalidate every entry once the current transaction commits.
+
+        Outside of a transaction (autocommit) it bumps right away.
+        """
+        transaction.on_commit(self.bump, using=using)
+
+    def make_key(self, params):
+        """Return the cache key for some json serializable params."""
+        signature = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.md5(signature.encode('utf-8')).hexdigest()
+        return self._key('{}:{}'.format(self.generation(), digest))
+
+    def get(self, key):
+        """Return the value stored under a key from `make_key`, or None."""
+        value = self.cache.get(key)
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value):
+        self.cache.set(key, value, timeout=self.timeout)
+
+    def stats(self):
+        """Return a dict with hits, misses and the current generation."""
+        hits = self.cache.get(self._key('hits'), 0)
+        misses = self.cache.get(self._key('misses'), 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': float(hits) / total if total else None,
+            'generation': self.generation(),
+            'timeout': self.timeout,
+        }
+
+    @staticmethod
+    def _new_generation():
+        return int(time.time() * 1000)
+
+    def _count(self, name):
+        key = self._key(name)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if not self.cache.add(key, 1, timeout=None):
+                self.cache.incr(key)
+
+
+class ExpiringTable:
+    """In-process copy of a small table, read again every ``timeout`` seconds.
+
+    ``class ExpiringTable(timeout=300)``
+
+    Subclasses implement ``load()``, that reads the table and returns the
+    structures to look it up, and read them with ``_data()``. Whoever writes
+    the table should call ``invalidate()`` (after the commit), other processes
+    read it again when it times out.
+
+    Usage::
+
+        class Countries(ExpiringTable):
+            def load(self):
+                return {country.code: country for country in Country.objects.all()}
+
+            def get(self, code):
+                return self._data().get(code)
+    """
+
+    def __init__(self, timeout=300):
+        self.timeout = timeout
+        self._loaded = None
+        self._loaded_at = 0
+
+    def load(self):
+        """Read the table, and return what ``_data()`` gives to the lookups."""
+        raise NotImplementedError
+
+    def _data(self):
+        loaded = self._loaded
+        if loaded is None or time.monotonic() - self._loaded_at > self.timeout:
+            loaded = self.reload()
+        return loaded
+
+    def reload(self):
+        """Read the table again, and return what ``load()`` returns."""
+        # A single assignment, threads reading meanwhile see the old or the new.
+        self._loaded, self._loaded_at = self.load(), time.monotonic()
+        return self._loaded
+
+    def invalidate(self):
+        """Forget the table, the next lookup reads it again."""
+        self._loaded = None
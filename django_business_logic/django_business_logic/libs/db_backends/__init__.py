@@ -0,0 +1 @@
+"""Database backends of the project, to use as ENGINE in DATABASES."""
@@ -0,0 +1,108 @@
+"""PostgreSQL backend that takes its connections from a per process pool.
+
+Django still opens and closes a connection around each request (with
+``CONN_MAX_AGE = 0``), but here opening takes one from the pool and closing
+gives it back, reset, so requests do not pay for the connection setup
+nor Postgres for forking a backend. See `tektank.libs.db_pool.ConnectionPool`.
+
+Settings::
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'tektank.libs.db_backends.pooled_postgresql',
+            ...
+            'POOL': {
+                'MIN_SIZE': 2,         # never closed for being idle
+                'MAX_SIZE': 20,        # at least the threads of the process
+                'TIMEOUT': 10,         # seconds waiting for a free connection
+                'MAX_IDLE': 300,       # seconds before closing an idle one
+                'MAX_LIFETIME': 1800,  # seconds before replacing one
+                'CHECK_IDLE': 30,      # idle seconds before checking it works
+            },
+        }
+    }
+
+The pool is per process: ``MAX_SIZE`` times the worker processes must fit in
+the ``max_connections`` of the server.
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from tektank.libs.db_pool import ConnectionPool, PoolTimeout, get_pool
+
+Database = base.Database
+
+
+def reset_connection(connection):
+    """Leave a connection given back to the pool as a new one, or raise.
+
+    Besides ending its transaction, the session state a request can leave
+    behind (SET values, temporary tables, WITH HOLD cursors of aborted
+    streams, advisory locks) is dropped with ``DISCARD ALL``. Django sets its
+    own session state again (time zone) each time it takes the connection.
+    """
+    end_transaction(connection)
+    with connection.cursor() as cursor:
+        cursor.execute('DISCARD ALL')
+
+
+def end_transaction(connection):
+    """Roll back the transaction in progress and go back to autocommit, or raise."""
+    if connection.closed:
+        raise Database.InterfaceError('connection already closed')
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        raise Database.InterfaceError('connection lost')
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    if not connection.autocommit:
+        connection.autocommit = True
+
+
+def check_connection(connection):
+    """Return True if the server answers on this connection."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    end_transaction(connection)
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.get_pool(conn_params)
+        try:
+            connection = self._pool.get()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+        self.isolation_level = connection.isolation_level
+        return connection
+
+    def get_pool(self, conn_params):
+        """Return the pool of the process for these settings."""
+        name = '{}:{}'.format(self.alias, conn_params.get('database', ''))
+        options = self.settings_dict.get('POOL', {})
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+
+        def connect():
+            connection = Database.connect(**conn_params)
+            if isolation_level is not None and connection.isolation_level != isolation_level:
+                connection.set_session(isolation_level=isolation_level)
+            return connection
+
+        return get_pool(name, lambda: ConnectionPool(
+            connect, reset_connection, check_connection,
+            min_size=options.get('MIN_SIZE', 0),
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 10),
+            max_idle=options.get('MAX_IDLE', 300),
+            max_lifetime=options.get('MAX_LIFETIME', 1800),
+            check_idle=options.get('CHECK_IDLE', 30),
+        ))
+
+    def _close(self):
+        if self.connection is not None:
+            if self.errors_occurred and not self.is_usable():
+                self._pool.discard(self.connection)
+            else:
+                self._pool.put(self.connection)
@@ -0,0 +1,251 @@
+"""Thread safe pool of database connections, shared by the threads of a process.
+
+Connections are reused LIFO, so the warm ones are used and the rest get
+idle and closed. Used by the ``pooled_postgresql`` backend
+(see `tektank.libs.db_backends`), but it knows nothing about Django.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Pools of this process by name, for `pool_stats`.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """No connection got free in time, and the pool is at its max size."""
+
+
+def get_pool(name, build):
+    """Return the pool registered under name, creating it with build() once."""
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = build()
+    return pool
+
+
+def pool_stats():
+    """Return the `ConnectionPool.stats` of every pool of this process, by name."""
+    return {name: pool.stats() for name, pool in list(_pools.items())}
+
+
+class ConnectionPool:
+    """Pool of connections between ``min_size`` and ``max_size``.
+
+    ``ConnectionPool(connect, reset, check, min_size=0, max_size=10, timeout=10,
+    max_idle=300, max_lifetime=1800, check_idle=30)``
+
+    Args:
+        connect (callable): Opens a new connection.
+        reset (callable): Leaves a returned connection ready for reuse, or
+            raises to discard it.
+        check (callable): Returns True if a connection still works.
+        min_size (int): Idle connections never closed for being idle. The
+            pool grows to it on demand.
+        max_size (int): Connections open at once, idle or in use.
+        timeout (float): Seconds `get` waits for a free connection.
+        max_idle (float): Seconds a connection above ``min_size`` can be idle.
+        max_lifetime (float): Seconds before a connection is replaced, so
+            server side memory and changes of the server are picked up.
+        check_idle (float): Connections idle longer than this are checked
+            before being handed out.
+
+    Usage::
+
+        conn = pool.get()
+        try:
+            ...
+        finally:
+            pool.put(conn)
+
+    """
+
+    def __init__(self, connect, reset, check, min_size=0, max_size=10, timeout=10,
+                 max_idle=300, max_lifetime=1800, check_idle=30):
+        self.connect = connect
+        self.reset = reset
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        # (connection, opened at, returned at), the last is the warmest.
+        self._idle = deque()
+        self._opened_at = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stats = dict.fromkeys((
+            'checkouts', 'waits', 'timeouts', 'opened', 'closed', 'failed_checks',
+        ), 0)
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._max_in_use = 0
+
+    def get(self):
+        """Return a connection, opening one or waiting for one if needed.
+
+        Raises:
+            PoolTimeout: if none got free in ``timeout`` seconds.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            conn = None
+            expired = []
+            with self._condition:
+                expired += self._reap()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            'No database connection free in {}s ({} open)'.format(
+                                self.timeout, self._size,
+                            )
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+                    expired += self._reap()
+                if self._idle:
+                    conn, opened_at, returned_at = self._idle.pop()
+                else:
+                    self._size += 1
+            self._close_all(expired)
+            if conn is None:
+                conn = self._open()
+            else:
+                now = time.monotonic()
+                if now - opened_at > self.max_lifetime:
+                    self._discard(conn)
+                    continue
+                if now - returned_at > self.check_idle and not self._check(conn):
+                    with self._condition:
+                        self._stats['failed_checks'] += 1
+                    self._discard(conn)
+                    continue
+            break
+
+        waited_for = time.monotonic() - start
+        with self._condition:
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._wait_time += waited_for
+                self._max_wait_time = max(self._max_wait_time, waited_for)
+            self._max_in_use = max(self._max_in_use, self._size - len(self._idle))
+        return conn
+
+    def put(self, conn):
+        """Give back a connection. Broken or too old ones are closed."""
+        opened_at = self._opened_at.get(id(conn), 0)
+        if time.monotonic() - opened_at > self.max_lifetime:
+            self._discard(conn)
+            return
+        try:
+            self.reset(conn)
+        except Exception:
+            logger.info('Discarding a database connection that can not be reset',
+                        exc_info=True)
+            self._discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, opened_at, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, conn):
+        """Close a connection taken with `get` instead of giving it back."""
+        self._discard(conn)
+
+    def close(self):
+        """Close the idle connections. The ones in use are closed on `put`."""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Return counters and gauges to size the pool and the workers.
+
+        ``saturation`` is the share of ``max_size`` in use now, and
+        ``waits``/``wait_time`` tell how often and how long checkouts waited
+        for a connection to get free.
+        """
+        with self._condition:
+            in_use = self._size - len(self._idle)
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'max_in_use': self._max_in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'saturation': float(in_use) / self.max_size if self.max_size else None,
+                'wait_time': self._wait_time,
+                'avg_wait_time': self._wait_time / stats['waits'] if stats['waits'] else 0.0,
+                'max_wait_time': self._max_wait_time,
+            })
+        return stats
+
+    def _open(self):
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opened_at[id(conn)] = time.monotonic()
+            self._stats['opened'] += 1
+        return conn
+
+    def _check(self, conn):
+        try:
+            return self.check(conn)
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._condition:
+            if self._opened_at.pop(id(conn), None) is not None:
+                self._size -= 1
+                self._stats['closed'] += 1
+            self._condition.notify()
+        self._close_all([conn])
+
+    def _reap(self):
+        """Take out the expired idle connections, returned to be closed.
+
+        Called holding the lock. The coldest connections are on the left.
+        """
+        now = time.monotonic()
+        expired = []
+        while self._idle and self._size > self.min_size:
+            conn, opened_at, returned_at = self._idle[0]
+            if now - returned_at <= self.max_idle and now - opened_at <= self.max_lifetime:
+                break
+            self._idle.popleft()
+            self._opened_at.pop(id(conn), None)
+            self._size -= 1
+            self._stats['closed'] += 1
+            expired.append(conn)
+        return expired
+
+    @staticmethod
+    def _close_all(conns):
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
@@ -0,0 +1,128 @@
+"""Read replicas: writes go to the primary, chosen reads to healthy replicas.
+
+``settings.DATABASE_REPLICAS`` lists the aliases (in DATABASES) of the
+replicas. Views opt in to reading from them (see `ReplicaReadMixin`), every
+write goes to ``default`` through `PrimaryReplicaRouter`.
+
+After a client writes, its reads stay on the primary for
+``REPLICA_STICKY_SECONDS`` (a cookie), so it never reads older data than the
+one it just wrote, whatever the replication lag.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = 'read_primary_until'
+
+# Seconds a replica is behind the primary, 0 when it replayed all it received.
+# NULL on a server that is not replicating.
+REPLICATION_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+class ReplicaSet:
+    """Choose a healthy replica at random.
+
+    Health is checked at most every ``REPLICA_HEALTH_CHECK_INTERVAL`` seconds
+    per replica and process: it must answer, and lag at most
+    ``REPLICA_MAX_LAG`` seconds. If none is healthy, reads go to the primary.
+    """
+
+    def __init__(self):
+        self._checks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def aliases(self):
+        return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+    def choose(self):
+        """Return the alias of a healthy replica, or None."""
+        healthy = [alias for alias in self.aliases if self.is_healthy(alias)]
+        return random.choice(healthy) if healthy else None
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+        with self._lock:
+            checked_at, healthy = self._checks.get(alias, (None, False))
+            if checked_at is not None and time.monotonic() - checked_at < interval:
+                return healthy
+            # Others keep the last result meanwhile, only one thread checks.
+            self._checks[alias] = (time.monotonic(), healthy)
+        healthy = self.check(alias)
+        with self._lock:
+            self._checks[alias] = (time.monotonic(), healthy)
+        return healthy
+
+    def check(self, alias):
+        """Return True if the replica answers and is not lagging too much."""
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(REPLICATION_LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            logger.warning('Replica %s is not available', alias, exc_info=True)
+            return False
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', 5)
+        if lag is not None and lag > max_lag:
+            logger.warning('Replica %s is %.1f seconds behind', alias, lag)
+            return False
+        return True
+
+    def mark_unhealthy(self, alias):
+        """Stop using a replica until its next check, after a query failed on it."""
+        logger.warning('Replica %s failed, reading from the primary', alias)
+        with self._lock:
+            self._checks[alias] = (time.monotonic(), False)
+
+
+replicas = ReplicaSet()
+
+
+class PrimaryReplicaRouter:
+    """Send every write to the primary, even for objects read from a replica.
+
+    Reads use ``default`` unless the queryset says otherwise, which is what
+    `ReplicaReadMixin` does. Replicas are copies: nothing is migrated there.
+    """
+
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas.aliases}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas.aliases:
+            return False
+        return None
+
+
+def pinned_to_primary(request):
+    """True if the client wrote recently, and must read from the primary."""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_to_primary(response):
+    """Make the client read from the primary for ``REPLICA_STICKY_SECONDS``."""
+    seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+    response.set_cookie(
+        STICKY_COOKIE, '{:.3f}'.format(time.time() + seconds), max_age=seconds, httponly=True,
+    )
@@ -0,0 +1,63 @@
+"""Sparse fieldsets: let clients choose which fields they want back.
+
+Usage::
+
+    GET /api/v1/activejobs/?fields=slug,title,amount_to_pay,date_end
+    GET /api/v1/activejobs/?omit=description,terms
+"""
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def _split(value):
+    return frozenset(name.strip() for name in value.split(',') if name.strip())
+
+
+def requested_fieldset(request):
+    """Return a tuple (fields, omit) with the names asked for in the request.
+
+    ``fields`` is None when the client did not narrow the output. Only read
+    requests can be narrowed, writes always answer with the whole object.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, frozenset()
+    params = request.query_params
+    fields = params.get(FIELDS_QUERY_PARAM)
+    omit = params.get(OMIT_QUERY_PARAM)
+    return (
+        _split(fields) if fields is not None else None,
+        _split(omit) if omit is not None else frozenset(),
+    )
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin that drops the fields not requested by the client.
+
+    Must be placed before the serializer class. Only the top level serializer
+    (or the child of a top level list) is narrowed.
+    """
+
+    @property
+    def is_sparse(self):
+        """True if the client narrowed the fields of this serializer."""
+        fields, omit = self._requested_fieldset()
+        return fields is not None or bool(omit)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted, omit = self._requested_fieldset()
+        if wanted is not None:
+            fields = type(fields)((k, v) for k, v in fields.items() if k in wanted)
+        for name in omit:
+            fields.pop(name, None)
+        return fields
+
+    def _requested_fieldset(self):
+        parent = self.parent
+        if parent is not None and (
+                not isinstance(parent, ListSerializer) or parent.parent is not None):
+            return None, frozenset()
+        return requested_fieldset(self.context.get('request'))
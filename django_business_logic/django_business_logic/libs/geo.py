@@ -0,0 +1,72 @@
+"""Distance searches over plain latitude/longitude columns (no PostGIS).
+
+A bounding box around the point is filtered first, which a B-tree index on
+(latitude, longitude) can serve. Only the rows inside the box get the exact
+(great circle) distance computed, to discard the corners and sort them.
+
+Usage::
+
+    jobs = within_radius(Job.objects.all(), 40.41, -3.70, 25).order_by('distance')
+"""
+import math
+
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+EARTH_RADIUS_KM = 6371.0
+# Length of one degree of latitude.
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def parse_point(value):
+    """Return (latitude, longitude) from a "lat,lon" string.
+
+    Raises:
+        ValueError: if it is not a valid point.
+    """
+    lat, lon = (float(part) for part in value.split(','))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('Coordinates out of range: {}'.format(value))
+    return lat, lon
+
+
+def bounding_box(lat, lon, km, lat_field='latitude', lon_field='longitude'):
+    """Return a Q with the rows inside the box around (lat, lon) of side 2*km."""
+    dlat = km / KM_PER_DEGREE
+    box = Q(**{lat_field + '__gte': lat - dlat, lat_field + '__lte': lat + dlat})
+    if abs(lat) + dlat >= 90:
+        # The box reaches a pole, every longitude is in.
+        return box
+    dlon = dlat / math.cos(math.radians(lat))
+    west, east = lon - dlon, lon + dlon
+    if west < -180 or east > 180:
+        # Crosses the antimeridian: two ranges.
+        return box & (
+            Q(**{lon_field + '__gte': (west + 360) if west < -180 else west})
+            | Q(**{lon_field + '__lte': (east - 360) if east > 180 else east})
+        )
+    return box & Q(**{lon_field + '__gte': west, lon_field + '__lte': east})
+
+
+def distance_expression(model, lat, lon, lat_field='latitude', lon_field='longitude'):
+    """Return an expression with the distance in km from (lat, lon) to each row."""
+    opts = model._meta
+    table = opts.db_table
+    lat_column = '"{}"."{}"'.format(table, opts.get_field(lat_field).column)
+    lon_column = '"{}"."{}"'.format(table, opts.get_field(lon_field).column)
+    # Spherical law of cosines, clamped so rounding never leaves acos domain.
+    sql = (
+        '%s * ACOS(LEAST(1.0, GREATEST(-1.0, '
+        'COS(RADIANS(%s)) * COS(RADIANS({lat})) * COS(RADIANS({lon}) - RADIANS(%s))'
+        ' + SIN(RADIANS(%s)) * SIN(RADIANS({lat})))))'
+    ).format(lat=lat_column, lon=lon_column)
+    return RawSQL(sql, (EARTH_RADIUS_KM, lat, lon, lat), output_field=FloatField())
+
+
+def within_radius(queryset, lat, lon, km, lat_field='latitude', lon_field='longitude'):
+    """Filter queryset to the rows at most km away, annotated with ``distance``."""
+    return queryset.filter(
+        bounding_box(lat, lon, km, lat_field, lon_field),
+    ).annotate(
+        distance=distance_expression(queryset.model, lat, lon, lat_field, lon_field),
+    ).filter(distance__lte=km)
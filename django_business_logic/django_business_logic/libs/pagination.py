@@ -0,0 +1,310 @@
+"""Pagination classes to use in our apps viewsets."""
+import json
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset (a.k.a. seek) pagination over a unique, indexed ordering.
+
+    ``class KeysetPagination(BasePagination)``
+
+    Instead of ``OFFSET n`` we remember the ordering values of the last row
+    returned and ask for the rows that come after it, so every page costs the
+    same no matter how deep it is. No COUNT is ever issued.
+
+    The ``ordering`` must be unique as a whole (that is why it ends with the
+    primary key), and ideally backed by a composite index.
+
+    Cursors are opaque to clients, they only have to follow the next and
+    previous links.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-created_at', '-pk')
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.reverse, position = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self._invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, position))
+
+        # Fetch one extra row, so we know if there is something after this page.
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        """Return the page size, allowing the client to ask for a smaller/bigger one."""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self._position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self._position(self.page[0]))
+
+    def decode_cursor(self, request, model):
+        """Return a tuple (reverse, position) from the cursor in the request.
+
+        Position is None when there is no cursor, i.e. we are on the first page.
+        Its values are parsed with the ordering fields of model, so they are
+        safe to filter with.
+
+        Raises:
+            NotFound: if the cursor was tampered with.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            reverse, position = bool(payload['r']), payload['p']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self._parse(model, field, value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, reverse, position):
+        """Return the url of the page given by the direction and position."""
+        payload = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _position(self, instance):
+        """Values of the ordering fields on an instance, as json friendly strings."""
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            position.append(None if value is None else str(value))
+        return position
+
+    @staticmethod
+    def _parse(model, field, value):
+        """Value of a position, as the python value of the ordering field."""
+        if not isinstance(value, str):
+            raise ValidationError('Invalid position')
+        name = field.lstrip('-')
+        model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        return model_field.to_python(value)
+
+    def _seek_filter(self, ordering, position):
+        """Build the "row comes after position" filter for a composite ordering.
+
+        For an ordering (a, b) this is ``a > x OR (a = x AND b > y)``, with
+        the comparison flipped for descending fields.
+        """
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {ordering[j].lstrip('-'): position[j] for j in range(i)}
+            equal['{}__{}'.format(name, lookup)] = position[i]
+            clauses.append(Q(**equal))
+        return reduce(or_, clauses)
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+
+# {(database alias, table): (estimated rows, when)}, see table_estimate().
+_table_estimates = {}
+TABLE_ESTIMATE_TIMEOUT = 60
+
+
+def table_estimate(model, using='default'):
+    """Return the planner estimate of rows in the table of a model, or None.
+
+    Read from ``pg_class.reltuples`` (kept by VACUUM/ANALYZE), and remembered
+    for a while, so it costs nothing most of the time. None if the database is
+    not Postgres.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    key = (using, model._meta.db_table)
+    estimate, when = _table_estimates.get(key, (None, 0))
+    if estimate is None or time.monotonic() - when > TABLE_ESTIMATE_TIMEOUT:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        estimate = max(row[0], 0) if row else 0
+        _table_estimates[key] = (estimate, time.monotonic())
+    return estimate
+
+
+def queryset_estimate(queryset):
+    """Return the planner estimate of rows a queryset returns (EXPLAIN), or None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountLimitOffsetPagination(LimitOffsetPagination):
+    """Limit/offset pagination that estimates the count of big results.
+
+    ``class EstimatedCountLimitOffsetPagination(LimitOffsetPagination)``
+
+    If the table is smaller than ``count_estimate_threshold`` rows, the count
+    is exact, as usual. Otherwise we ask the planner: straight from pg_class if
+    there are no filters, or from EXPLAIN. If the estimate is still above the
+    threshold, it is the count we send, and ``count_is_exact`` is False.
+
+    Whether there is a next page is always exact: we fetch one row more than
+    the limit. If the last page is reached, the count becomes exact again (an
+    empty page past the end says nothing about the count, so it stays estimated).
+    """
+
+    count_estimate_threshold = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_is_exact = True
+        estimate = self.get_estimated_count(queryset)
+        if estimate is None or estimate < self.count_estimate_threshold:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        self.display_page_controls = self.template is not None
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        page = results[:self.limit]
+        if len(results) <= self.limit and (results or self.offset == 0):
+            # No next page, and not past the end: every row is before or in it.
+            self.count = self.offset + len(page)
+        else:
+            # More pages, or an offset past the end: we do not know where it ends.
+            self.count_is_exact = False
+            # Never announce less rows than the ones we know are there.
+            self.count = max(estimate, self.offset + len(results))
+        return page
+
+    def get_estimated_count(self, queryset):
+        """Return an estimate of rows, or None if there is no need or no way."""
+        if self.count_estimate_threshold is None or not hasattr(queryset, 'query'):
+            return None
+        estimate = table_estimate(queryset.model, using=queryset.db)
+        if estimate is None or estimate < self.count_estimate_threshold:
+            return estimate
+        if not queryset.query.where:
+            return estimate
+        return queryset_estimate(queryset)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('count_is_exact', self.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class OptInKeysetPagination(BasePagination):
+    """Limit/offset pagination, unless the client asks for keyset pagination.
+
+    Clients opt in with ``?pagination=cursor`` for the first page; after that,
+    the ``cursor`` parameter carried by the next/previous links is enough.
+    """
+
+    mode_query_param = 'pagination'
+    keyset_mode = 'cursor'
+    keyset_class = KeysetPagination
+    default_class = LimitOffsetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginator(self, request):
+        """Return the paginator instance that will do the actual work."""
+        params = request.query_params
+        if (params.get(self.mode_query_param) == self.keyset_mode
+                or self.keyset_class.cursor_query_param in params):
+            return self.keyset_class()
+        return self.default_class()
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    @property
+    def display_page_controls(self):
+        return getattr(getattr(self, 'paginator', None), 'display_page_controls', False)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_fields(self, view):
+        return self.default_class().get_schema_fields(view)
+
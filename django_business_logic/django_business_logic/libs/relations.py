@@ -0,0 +1,24 @@
+"""Serializer relations that parse ids without looking them up.
+
+`PrimaryKeyRelatedField` runs a query per field and item to turn each id
+into an instance. `PrimaryKeyIdField` only checks the id has the type of the
+related primary key, and the instances are fetched afterwards for a whole
+request, one query per related table (see
+`tektank.libs.validation.resolve_foreign_keys`).
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+
+
+class PrimaryKeyIdField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField whose input is the id, type checked, not the instance."""
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            return self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
@@ -0,0 +1,175 @@
+"""Model validation of many instances at once.
+
+``full_clean`` checks that each foreign key exists with one query per field
+and instance. Here foreign keys are checked (or resolved from ids) for all
+the instances together, with one ``IN`` query per related table, and the
+rest of ``full_clean`` runs as usual.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+
+
+def batched_foreign_keys(model, exclude=()):
+    """Return the foreign keys of model that `foreign_key_errors` can check.
+
+    Parent links and keys with ``limit_choices_to`` are left to ``full_clean``.
+    """
+    return [
+        field for field in model._meta.concrete_fields
+        if field.many_to_one and field.name not in exclude
+        and not field.remote_field.parent_link and not field.remote_field.limit_choices_to
+    ]
+
+
+def foreign_key_errors(instances, exclude=()):
+    """Return the foreign key errors of each instance, as ``{field: [errors]}``.
+
+    Related objects already set on an instance (``job.city = city``) that
+    were loaded from the database are trusted, without querying them again;
+    the database constraint still guards the insert. Only bare ids are
+    looked up.
+
+    Args:
+        instances (list): Instances of the same model.
+        exclude (list): Names of the fields not to check.
+
+    Returns:
+        list: A dict per instance, empty if its foreign keys are valid.
+
+    """
+    errors = [{} for _ in instances]
+    if not instances:
+        return errors
+    fields = batched_foreign_keys(type(instances[0]), exclude)
+    # (related model, to field) -> value -> [(instance index, field)]
+    pending = defaultdict(lambda: defaultdict(list))
+    for index, instance in enumerate(instances):
+        for field in fields:
+            try:
+                value = _id_to_check(instance, field)
+            except ValidationError as err:
+                errors[index].setdefault(field.name, []).extend(err.error_list)
+                continue
+            if value is not None:
+                key = (field.related_model, field.remote_field.field_name)
+                pending[key][value].append((index, field))
+
+    for (model, field_name), values in pending.items():
+        found = set(model._default_manager.filter(
+            **{field_name + '__in': list(values)}
+        ).values_list(field_name, flat=True))
+        for value, uses in values.items():
+            if value in found:
+                continue
+            for index, field in uses:
+                errors[index].setdefault(field.name, []).append(ValidationError(
+                    field.error_messages['invalid'],
+                    code='invalid',
+                    params={
+                        'model': model._meta.verbose_name, 'pk': value,
+                        'field': field_name, 'value': value,
+                    },
+                ))
+    return errors
+
+
+def _id_to_check(instance, field):
+    """Return the id of field to look up, or None if there is nothing to query.
+
+    Raises:
+        ValidationError: if the field is empty and required, or not an id.
+    """
+    value = getattr(instance, field.attname)
+    if value in field.empty_values:
+        if not field.blank:
+            raise ValidationError(field.error_messages['blank'], code='blank')
+        return None
+    related = field.get_cached_value(instance, None)
+    if related is not None and not related._state.adding:
+        return None
+    return field.target_field.to_python(value)
+
+
+def resolve_foreign_keys(model, rows, exclude=()):
+    """Replace the ids of foreign keys in rows by the related instances.
+
+    Rows are dicts of field values of model, like the kwargs to create it.
+    Values of foreign keys that are not instances yet are converted to the
+    type of the related key (``"5"`` is id 5), and fetched with one query per
+    related table for all rows, so each related row is read once.
+
+    Args:
+        model: The model the rows are for.
+        rows (list): Dicts of {field name: value}, changed in place.
+        exclude (list): Names of the fields not to resolve.
+
+    Returns:
+        list: A dict per row, ``{field: [messages]}`` with the ids that are
+        not valid or do not exist, or empty.
+
+    """
+    errors = [{} for _ in rows]
+    fields = {field.name: field for field in batched_foreign_keys(model, exclude)}
+    # (related model, to field) -> id -> [(row index, field name)]
+    pending = defaultdict(lambda: defaultdict(list))
+    for index, row in enumerate(rows):
+        for name, value in row.items():
+            field = fields.get(name)
+            if field is None or value is None or isinstance(value, field.related_model):
+                continue
+            try:
+                value = field.target_field.to_python(value)
+            except ValidationError as err:
+                errors[index].setdefault(name, []).extend(err.messages)
+                continue
+            except (TypeError, ValueError):
+                errors[index].setdefault(name, []).append(
+                    'Incorrect type. Expected pk value, received {}.'.format(
+                        type(value).__name__)
+                )
+                continue
+            pending[field.related_model, field.remote_field.field_name][value].append(
+                (index, name)
+            )
+
+    for (related_model, field_name), values in pending.items():
+        found = {
+            getattr(obj, field_name): obj
+            for obj in related_model._default_manager.filter(
+                **{field_name + '__in': list(values)}
+            )
+        }
+        for value, uses in values.items():
+            for index, name in uses:
+                if value in found:
+                    rows[index][name] = found[value]
+                else:
+                    errors[index].setdefault(name, []).append(
+                        'Invalid pk "{}" - object does not exist.'.format(value)
+                    )
+    return errors
+
+
+def full_clean_all(instances, exclude=()):
+    """Run ``full_clean`` on every instance, checking foreign keys in bulk.
+
+    The uniqueness of a primary key generated by its default (a new uuid) is
+    not queried either.
+
+    Returns:
+        list: A ValidationError per instance, or None if it is valid.
+
+    """
+    results = []
+    for instance, errors in zip(instances, foreign_key_errors(instances, exclude)):
+        skip = list(exclude) + [field.name for field in batched_foreign_keys(type(instance))]
+        pk = instance._meta.pk
+        if instance._state.adding and pk.has_default():
+            skip.append(pk.name)
+        try:
+            instance.full_clean(exclude=skip)
+        except ValidationError as err:
+            errors = err.update_error_dict(errors)
+        results.append(ValidationError(errors) if errors else None)
+    return results
@@ -0,0 +1,125 @@
+"""Serialize rows straight from ``values()``, without building model instances.
+
+For big read only lists, instantiating a model per row and walking every
+serializer field costs more than the SQL itself. Here we look at the serializer
+fields once, and precompute a converter per field that turns the raw column
+value into exactly what the serializer would have output.
+
+Fields we can not reproduce exactly (method fields, nested serializers, ...)
+make `values_plan` return None, so callers fall back to the serializer.
+"""
+from django.db.models import FileField as ModelFileField
+from rest_framework import fields as drf_fields
+from rest_framework.relations import PrimaryKeyRelatedField, StringRelatedField
+from rest_framework.settings import api_settings
+
+
+def _identity(value):
+    return value
+
+
+# Fields whose ``to_representation`` is exactly a builtin call.
+_BUILTIN_CONVERTERS = {
+    drf_fields.CharField: str,
+    drf_fields.EmailField: str,
+    drf_fields.SlugField: str,
+    drf_fields.IntegerField: int,
+}
+
+
+def _file_converter(storage):
+    def convert(value, request):
+        if not value:
+            return None
+        url = storage.url(value)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def _field_plan(name, field, model_field, string_related):
+    """Return the (field name, column, converter, needs request) of a field, or None."""
+    column = model_field.name
+    if isinstance(field, StringRelatedField):
+        if name not in string_related:
+            return None
+        return (name, string_related[name], str, False)
+    if isinstance(field, PrimaryKeyRelatedField):
+        if field.pk_field is not None or not model_field.is_relation:
+            return None
+        # values() gives the related pk for a FK, which is what we output.
+        return (name, column, _identity, False)
+    if isinstance(field, drf_fields.FileField):
+        if not isinstance(model_field, ModelFileField) or not getattr(
+                field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return None
+        return (name, column, _file_converter(model_field.storage), True)
+    if model_field.is_relation or isinstance(
+            field, (drf_fields.SerializerMethodField, drf_fields.ModelField)):
+        # ModelField works on the whole instance, not on the column value.
+        return None
+    if type(field) in _BUILTIN_CONVERTERS:
+        return (name, column, _BUILTIN_CONVERTERS[type(field)], False)
+    if type(field) is drf_fields.UUIDField and field.uuid_format == 'hex_verbose':
+        return (name, column, str, False)
+    # Plain column: the field's own conversion gives identical output.
+    return (name, column, field.to_representation, False)
+
+
+def values_plan(serializer, string_related=None):
+    """Return a list of (field name, column, converter, needs request) or None.
+
+    ``serializer`` must be a ModelSerializer (already narrowed if needed).
+
+    ``string_related`` maps StringRelatedField names to the ``values()`` lookup
+    that gives the same text as the related model ``__str__``, for example
+    ``{'post_category': 'post_category__name'}``.
+    """
+    string_related = string_related or {}
+    model = serializer.Meta.model
+    concrete = {f.name: f for f in model._meta.concrete_fields}
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or len(field.source_attrs) != 1:
+            return None
+        model_field = concrete.get(field.source_attrs[0])
+        if model_field is None:
+            return None
+        step = _field_plan(name, field, model_field, string_related)
+        if step is None:
+            return None
+        plan.append(step)
+    return plan
+
+
+def iter_values(rows, plan, request=None):
+    """Yield output dicts from ``values()`` rows, following a `values_plan`."""
+    converters = [
+        (name, column, convert if not needs_request else _bind_request(convert, request))
+        for name, column, convert, needs_request in plan
+    ]
+    for row in rows:
+        item = {}
+        for name, column, convert in converters:
+            value = row[column]
+            item[name] = None if value is None else convert(value)
+        yield item
+
+
+def serialize_values(rows, plan, request=None):
+    """Convert ``values()`` rows into a list of output dicts following a `values_plan`."""
+    return list(iter_values(rows, plan, request))
+
+
+def plan_columns(plan, model, extra=()):
+    """Return the ``values()`` columns to read for a plan: pk, plan ones, extra."""
+    columns = [model._meta.pk.name]
+    for column in [c for _, c, _, _ in plan] + list(extra):
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+
+def _bind_request(convert, request):
+    return lambda value: convert(value, request)
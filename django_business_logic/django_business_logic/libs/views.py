@@ -1,5 +1,450 @@
 """File with combination of classes to inherit in our apps"""
-from rest_framework import mixins, viewsets
+import hashlib
+from calendar import timegm
+from collections import Counter
+
+from django.db import InterfaceError, OperationalError
+from django.db.models import Count
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import mixins, serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.response import Response
+
+from tektank.libs.db_routers import pin_to_primary, pinned_to_primary, replicas
+from tektank.libs.export import csv_lines, ndjson_lines
+from tektank.libs.fieldsets import requested_fieldset
+from tektank.libs.values import iter_values, plan_columns, serialize_values, values_plan
+
+# Plans depend on the fieldset requested by clients, so caches are bounded.
+MAX_CACHED_PLANS = 256
+
+
+def _cached_plan(cache, key, build):
+    if key not in cache:
+        if len(cache) >= MAX_CACHED_PLANS:
+            cache.clear()
+        cache[key] = build()
+    return cache[key]
+
+
+def related_lookups(serializer):
+    """Return the (select_related, prefetch_related) lookups a serializer needs.
+
+    Only relations that are actually dereferenced count: a PrimaryKeyRelatedField
+    reads the ``<name>_id`` column, so it does not need a join.
+    """
+    select, prefetch = [], []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        lookup = '__'.join(field.source_attrs)
+        if isinstance(field, ManyRelatedField):
+            prefetch.append(lookup)
+        elif isinstance(field, serializers.ListSerializer):
+            prefetch.append(lookup)
+        elif isinstance(field, RelatedField) and not field.use_pk_only_optimization():
+            select.append(lookup)
+        elif isinstance(field, serializers.BaseSerializer):
+            select.append(lookup)
+    return select, prefetch
+
+
+def loaded_columns(serializer, model):
+    """Return the model fields a serializer reads, or None if we can not tell.
+
+    Used to ``only()`` the columns of a narrowed serializer. Anything that is
+    not a plain model field (properties, methods, whole instance) means that
+    every column must be loaded.
+    """
+    concrete = {f.name for f in model._meta.concrete_fields}
+    columns = []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or field.source_attrs[0] not in concrete:
+            return None
+        columns.append(field.source_attrs[0])
+    return columns
+
+
+def normalized_params(request, names):
+    """Return {name: sorted non blank values} of the query parameters in names."""
+    params = {}
+    for name in names:
+        values = sorted(v.strip() for v in request.query_params.getlist(name) if v.strip())
+        if values:
+            params[name] = values
+    return params
+
+
+class SelectRelatedMixin:
+    """Load only what the serializer is going to render.
+
+    Joins or batch loads the related rows that the serializer touches, which
+    avoids one query per row and relation when rendering lists. If the client
+    narrowed the fields (see `SparseFieldsetMixin`), only their columns are read.
+
+    The plan is computed from the serializer fields, once per serializer class
+    and requested fieldset. Columns needed by the view itself (for example the
+    pagination ordering) should be listed in ``required_columns``.
+    """
+
+    required_columns = ()
+    _read_plans = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select, prefetch, only = self.get_read_plan()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if only:
+            queryset = queryset.only(*only)
+        return queryset
+
+    def get_read_plan(self):
+        """Return the (select_related, prefetch_related, only) lookups to apply."""
+        key = (self.get_serializer_class(),) + requested_fieldset(
+            getattr(self, 'request', None))
+        return _cached_plan(self._read_plans, key, self._build_read_plan)
+
+    def _build_read_plan(self):
+        serializer = self.get_serializer()
+        select, prefetch = related_lookups(serializer)
+        only = None
+        if getattr(serializer, 'is_sparse', False):
+            only = loaded_columns(serializer, serializer.Meta.model)
+        if only is not None:
+            only += [c for c in self.required_columns if c not in only]
+        return select, prefetch, only
+
+
+class ValuesListMixin:
+    """Serve GET lists from ``values()`` rows, without model instances.
+
+    The serializer is only used to know the fields and how to convert them
+    (see `values_plan`); the output is the same as going through it. If the
+    serializer has fields that can not be converted from raw columns, the
+    regular list is used.
+
+    ``values_string_related`` maps StringRelatedField names to the lookup that
+    gives the same text as the related model ``__str__``.
+    """
+
+    values_string_related = {}
+    required_columns = ()
+    _values_plans = {}
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values(*plan_columns(plan, queryset.model, self.required_columns))
+
+        page = self.paginate_queryset(queryset)
+        data = serialize_values(page if page is not None else queryset, plan, request)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def get_values_plan(self):
+        """Return the cached `values_plan` for the current serializer and fieldset."""
+        key = (self.get_serializer_class(),) + requested_fieldset(
+            getattr(self, 'request', None))
+        return _cached_plan(
+            self._values_plans, key,
+            lambda: values_plan(self.get_serializer(), self.values_string_related),
+        )
+
+
+def may_cache_reads(view):
+    """Whether the rows read by view can be stored in a cache.
+
+    They can, unless the view reads from a replica (see `ReplicaReadMixin`).
+    """
+    check = getattr(view, 'may_cache_reads', None)
+    return check is None or check()
+
+
+class CachedListMixin:
+    """Cache list responses, keyed by the normalized query parameters.
+
+    ``list_cache`` is a `GenerationCache`, whoever writes the model must bump
+    it. Only the filterset parameters and the ones in ``list_cache_params``
+    (pagination, fieldsets) are part of the key: the view ignores the rest, so
+    they should not split the cache.
+    """
+
+    list_cache = None
+    list_cache_params = ('limit', 'offset', 'cursor', 'pagination', 'fields', 'omit')
+
+    def list(self, request, *args, **kwargs):
+        if self.list_cache is None:
+            return super().list(request, *args, **kwargs)
+        key = self.list_cache.make_key(self.get_list_cache_params(request))
+        data = self.list_cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and may_cache_reads(self):
+            self.list_cache.set(key, response.data)
+        return response
+
+    def get_list_cache_params(self, request):
+        """Return the normalized parameters that identify a list response."""
+        names = set(self.list_cache_params)
+        filterset_class = getattr(self, 'filterset_class', None)
+        if filterset_class is not None:
+            names.update(filterset_class.base_filters)
+        params = normalized_params(request, names)
+        # Links in the response are absolute, so they depend on the host too.
+        return [request.is_secure(), request.get_host(), request.path, params]
+
+
+class ConditionalRetrieveMixin:
+    """Answer retrieves with ETag/Last-Modified, and 304 when nothing changed.
+
+    The version of the object is read with a single query on the lookup field
+    that only fetches the pk and ``version_field``, so a 304 never loads nor
+    serializes the object.
+
+    The fieldset requested is part of the ETag, as it changes the representation.
+    """
+
+    version_field = 'updated_at'
+
+    def retrieve(self, request, *args, **kwargs):
+        pk, modified = self.get_object_version()
+        etag = self.get_etag(request, pk, modified)
+        last_modified = timegm(modified.utctimetuple()) if modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_object_version(self):
+        """Return (pk, version) of the object being retrieved.
+
+        Raises:
+            Http404: when there is no such object.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        row = queryset.values_list('pk', self.version_field).first()
+        if row is None:
+            raise Http404
+        return row
+
+    def get_etag(self, request, pk, modified):
+        fields, omit = requested_fieldset(request)
+        signature = '{}:{}:{}:{}'.format(
+            pk,
+            modified.isoformat() if modified else '',
+            ','.join(sorted(fields)) if fields is not None else '*',
+            ','.join(sorted(omit)),
+        )
+        return quote_etag(hashlib.md5(signature.encode('utf-8')).hexdigest())
+
+
+class StreamingExportMixin:
+    """Add an ``export`` action that streams the whole filtered list.
+
+    ``GET <list url>/export/?export_format=ndjson|csv&<filters>``
+
+    Rows are read through a server side cursor (``iterator(chunk_size)``) and
+    written as they come, so memory does not depend on the number of rows.
+    No pagination nor COUNT. If the view has a values plan (`ValuesListMixin`)
+    rows are converted from ``values()``, otherwise with the serializer.
+    """
+
+    export_chunk_size = 2000
+    export_format_query_param = 'export_format'
+    export_formats = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """Stream every row matching the filters, as NDJSON (default) or CSV."""
+        export_format = request.query_params.get(self.export_format_query_param, 'ndjson')
+        if export_format not in self.export_formats:
+            raise ValidationError({self.export_format_query_param: [
+                'Choose one of: {}.'.format(', '.join(sorted(self.export_formats))),
+            ]})
+        queryset = self.filter_queryset(self.get_queryset())
+        items = self.export_items(queryset)
+        if export_format == 'csv':
+            header = [name for name, f in self.get_serializer().fields.items() if not f.write_only]
+            lines = csv_lines(items, header)
+        else:
+            lines = ndjson_lines(items)
+        response = StreamingHttpResponse(lines, content_type=self.export_formats[export_format])
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(
+            queryset.model._meta.model_name, export_format,
+        )
+        return response
+
+    def export_items(self, queryset):
+        """Yield the output dicts of every row in queryset."""
+        plan = self.get_values_plan() if hasattr(self, 'get_values_plan') else None
+        if plan is not None:
+            rows = queryset.values(*plan_columns(plan, queryset.model)).iterator(
+                chunk_size=self.export_chunk_size,
+            )
+            yield from iter_values(rows, plan, self.request)
+            return
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        for instance in queryset.iterator(chunk_size=self.export_chunk_size):
+            yield serializer_class(instance, context=context).data
+
+
+def facet_counts(queryset, facets):
+    """Count the rows of queryset by each facet, with a single grouped query.
+
+    ``facets`` maps facet names to a ``values()`` lookup or an expression.
+    Rows are grouped by all facets at once and each facet is summed up from
+    those groups, so the database is read once whatever the number of facets.
+
+    Returns:
+        dict: ``{facet: [{"value": value, "count": n}, ...]}``, most common
+        first. Rows where the facet is null are not counted in it.
+    """
+    annotations, columns = {}, {}
+    for name, facet in facets.items():
+        if isinstance(facet, str):
+            columns[name] = facet
+        else:
+            columns[name] = '_facet_' + name
+            annotations[columns[name]] = facet
+    rows = queryset.order_by().annotate(**annotations).values(
+        *columns.values()).annotate(_facet_count=Count('pk'))
+    counters = {name: Counter() for name in facets}
+    for row in rows:
+        for name, column in columns.items():
+            if row[column] is not None:
+                counters[name][row[column]] += row['_facet_count']
+    return {
+        name: [{'value': value, 'count': count} for value, count in counter.most_common()]
+        for name, counter in counters.items()
+    }
+
+
+class FacetsMixin:
+    """Add a ``facets`` action with the counts of the filtered list by facet.
+
+    ``GET <list url>/facets/?<filters>``
+
+    ``facet_fields`` maps names to a ``values()`` lookup or an expression (see
+    `facet_counts`). Counts are cached in ``facets_cache`` (a
+    `GenerationCache`) by the filter parameters.
+    """
+
+    facet_fields = {}
+    facets_cache = None
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request, *args, **kwargs):
+        """Return the counts by facet of the rows matching the filters."""
+        key = None
+        if self.facets_cache is not None:
+            key = self.facets_cache.make_key(self.get_facets_cache_params(request))
+            data = self.facets_cache.get(key)
+            if data is not None:
+                return Response(data)
+        data = facet_counts(self.filter_queryset(self.get_queryset()), self.facet_fields)
+        if key is not None and may_cache_reads(self):
+            self.facets_cache.set(key, data)
+        return Response(data)
+
+    def get_facets_cache_params(self, request):
+        """Return the normalized filter parameters, that identify the counts."""
+        filterset_class = getattr(self, 'filterset_class', None)
+        names = filterset_class.base_filters if filterset_class is not None else ()
+        return [request.path, normalized_params(request, names)]
+
+
+class ReplicaReadMixin:
+    """Read from a replica on safe requests (see `tektank.libs.db_routers`).
+
+    The queryset of GET/HEAD/OPTIONS requests is bound to one healthy replica,
+    chosen once per request, so lazy querysets (streamed exports, pagination
+    counts) read from it too. Unsafe requests read and write on the primary,
+    and when they succeed the client is pinned to the primary for a while,
+    so it reads its own writes.
+
+    Rows read from a replica are never cached (see `CachedListMixin`): it can
+    be behind the last write, and the cache would keep them under the new
+    generation, for pinned clients too. If the replica fails, it is not used
+    until its next health check and the request is answered from the primary.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        alias = self.get_read_database()
+        return queryset.using(alias) if alias is not None else queryset
+
+    def get_read_database(self):
+        """Return the replica alias the request reads from, or None (primary)."""
+        if not hasattr(self, '_read_database'):
+            request = getattr(self, 'request', None)
+            self._read_database = None
+            if (request is not None and request.method in SAFE_METHODS
+                    and not pinned_to_primary(request)):
+                self._read_database = replicas.choose()
+        return self._read_database
+
+    def may_cache_reads(self):
+        """Whether the rows read by this request can be stored in a cache."""
+        return self.get_read_database() is None
+
+    def fall_back_to_primary(self, exc):
+        """Stop reading from the replica if exc is a failure of it.
+
+        Returns:
+            bool: True if the replica was marked unhealthy, and the request
+            can run again on the primary.
+        """
+        alias = getattr(self, '_read_database', None)
+        if alias is None or not isinstance(exc, (OperationalError, InterfaceError)):
+            return False
+        replicas.mark_unhealthy(alias)
+        self._read_database = None
+        return True
+
+    def handle_exception(self, exc):
+        if self.fall_back_to_primary(exc):
+            try:
+                # Safe requests can run again, on the primary this time.
+                handler = getattr(self, self.request.method.lower())
+                return handler(self.request, *self.args, **self.kwargs)
+            except Exception as retry_exc:
+                exc = retry_exc
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(response)
+        return response
+
 
 class APIViewSet(
         viewsets.GenericViewSet,
@@ -10,5 +455,3 @@ class APIViewSet(
         mixins.DestroyModelMixin,
 ):
     pass
-
-
@@ -52,6 +52,10 @@ USE_TZ = True
 MEDIA_ROOT = normpath(join(SITE_ROOT, 'media'))
 MEDIA_URL = '/media/'
 
+# Exports written by `manage.py export_jobs`. They have personal data: keep
+# them out of MEDIA_ROOT and STATIC_ROOT, so they are never served.
+EXPORTS_ROOT = normpath(join(SITE_ROOT, 'exports'))
+
 ########## STATIC FILE CONFIGURATION
 # Absolute path to the directory static files should be collected to. Don't put
 # anything in this directory yourself; store your static files in apps' static/
@@ -263,8 +267,53 @@ REST_FRAMEWORK = {
 #    'DATETIME_FORMAT':'%s',
 #    'DATETIME_INPUT_FORMATS':'%s',
 }
+# Job listings above this number of rows send an estimated count (None: always exact).
+JOBS_COUNT_ESTIMATE_THRESHOLD = 10000
+# Max jobs created by one request to the batch endpoint.
+JOBS_MAX_BATCH_SIZE = 500
 ######## REST Framework config END
 
+########## ASGI CONFIG
+# Threads running Django code (views, ORM) under asgi.py. Bounds the database
+# connections opened by each process.
+ASGI_THREADS = 10
+# Threads reading streamed responses (exports), apart from the ones above, so
+# long downloads do not starve the other requests.
+ASGI_STREAMING_THREADS = 10
+########## ASGI CONFIG END
+
+########## DATABASE REPLICAS CONFIG
+# Aliases in DATABASES of read replicas. Safe requests of the job endpoints
+# read from a healthy one, everything else uses the primary ('default').
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['tektank.libs.db_routers.PrimaryReplicaRouter']
+# Seconds a client reads from the primary after writing, longer than the lag.
+REPLICA_STICKY_SECONDS = 5
+# Replicas further behind than these seconds are not used.
+REPLICA_MAX_LAG = 5
+# Seconds between health checks of each replica, per process.
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+########## DATABASE REPLICAS CONFIG END
+
+########## SEARCH CONFIG
+# Postgres text search configuration for jobs full text search.
+JOBS_SEARCH_CONFIG = 'english'
+# Radius in km of ?near= searches when not given, and the largest one allowed.
+JOBS_NEAR_DEFAULT_RADIUS = 25
+JOBS_NEAR_MAX_RADIUS = 500
+########## SEARCH CONFIG END
+
+########## CACHE CONFIG
+# Seconds a job listing can be served from cache. Writes invalidate it before.
+JOBS_LIST_CACHE_TIMEOUT = 60
+# Seconds the in-memory copy of PostArea names is used before reloading it.
+POST_AREAS_CACHE_TIMEOUT = 300
+# Same for the PaymentComission brackets, sorted by the field below: the
+# lowest amount to pay each comission applies to.
+PAYMENT_COMISSIONS_CACHE_TIMEOUT = 300
+PAYMENT_COMISSION_BOUND_FIELD = 'min_amount'
+########## CACHE CONFIG END
+
 ########## CORS CONFIG
 # https://github.com/ottoyiu/django-cors-headers
 # TODO : Configurar algo mas seguro??
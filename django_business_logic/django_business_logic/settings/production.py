@@ -5,7 +5,7 @@ from __future__ import absolute_import
 from os import environ
 
 from .base import *
-from decouple import config
+from decouple import Csv, config
 
 ALLOWED_HOSTS = []
 
@@ -19,18 +19,50 @@ EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_SUBJECT_PREFIX = '[%s] ' % SITE_NAME
 SERVER_EMAIL = EMAIL_HOST_USER
 
+# Connections come from a pool of each process (tektank.libs.db_pool), and
+# go back to it at the end of the request. Stats in jobs/db-stats/.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'tektank.libs.db_backends.pooled_postgresql',
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': '',
+        'POOL': {
+            'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            # At least the threads using the database under asgi.py.
+            'MAX_SIZE': config(
+                'DB_POOL_MAX_SIZE', default=ASGI_THREADS + ASGI_STREAMING_THREADS, cast=int,
+            ),
+            'TIMEOUT': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            'MAX_IDLE': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+            'MAX_LIFETIME': config('DB_POOL_MAX_LIFETIME', default=1800, cast=float),
+            'CHECK_IDLE': config('DB_POOL_CHECK_IDLE', default=30, cast=float),
+        },
     }
 }
 
-CACHES = {}
+# Read replicas, comma separated hosts. Same database and credentials.
+for index, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv())):
+    alias = 'replica_{}'.format(index)
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host)
+    DATABASE_REPLICAS.append(alias)
+
+# Use a shared backend (memcached, redis): a job write must invalidate the
+# cached listings of every worker, not only the ones of its own process.
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+# With a per-process cache other workers would serve stale listings after a
+# write, so listings are not cached at all.
+if CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    JOBS_LIST_CACHE_TIMEOUT = 0
 
 SECRET_KEY = get_env_setting('SECRET_KEY')
 
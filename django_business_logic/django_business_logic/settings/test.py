@@ -21,3 +21,6 @@ DATABASES = {
 PASSWORD_HASHERS = (
     'django.contrib.auth.hashers.UnsaltedMD5PasswordHasher',
 )
+
+# Tests create jobs straight with the ORM, do not serve them stale listings.
+JOBS_LIST_CACHE_TIMEOUT = 0